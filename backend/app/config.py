@@ -5,6 +5,55 @@ load_dotenv()
 
 class Config:
     MONGO_URI = os.getenv('MONGO_URI', "mongodb://localhost:27017/")
+    MONGO_MAX_POOL_SIZE = int(os.getenv('MONGO_MAX_POOL_SIZE', "100"))
+    MONGO_MIN_POOL_SIZE = int(os.getenv('MONGO_MIN_POOL_SIZE', "10"))
+    MONGO_MAX_IDLE_TIME_MS = int(os.getenv('MONGO_MAX_IDLE_TIME_MS', "60000"))
+    MONGO_WAIT_QUEUE_TIMEOUT_MS = int(os.getenv('MONGO_WAIT_QUEUE_TIMEOUT_MS', "5000"))
     OLLAMA_BASE_URL = os.getenv('OLLAMA_BASE_URL', "http://localhost:11434")
     EMBEDDING_MODEL = os.getenv('EMBEDDING_MODEL', "all-MiniLM-L6-v2")
+    WARMUP_ON_STARTUP = os.getenv('WARMUP_ON_STARTUP', "true").lower() == "true"
+    PRELOAD_USER_IDS = [u for u in os.getenv('PRELOAD_USER_IDS', "").split(",") if u]  # indexes loaded at startup
     SECRET_KEY = os.getenv('SECRET_KEY', 'your-secret-key-change-this-in-production')
+    CPU_WORKERS = int(os.getenv('CPU_WORKERS', str(min(4, os.cpu_count() or 1))))
+    BCRYPT_ROUNDS = int(os.getenv('BCRYPT_ROUNDS', "12"))  # cost factor for new password hashes
+    BCRYPT_WORKERS = int(os.getenv('BCRYPT_WORKERS', "2"))  # concurrent hash/check operations
+    TOKEN_CACHE_SIZE = int(os.getenv('TOKEN_CACHE_SIZE', "10000"))  # verified tokens kept until they expire
+    EMBEDDING_STORAGE = os.getenv('EMBEDDING_STORAGE', "float32")  # float32 | float16 | int8
+    EMBED_BATCH_SIZE = int(os.getenv('EMBED_BATCH_SIZE', "64"))
+    QUERY_CACHE_MAX_BYTES = int(os.getenv('QUERY_CACHE_MAX_BYTES', str(32 * 1024 * 1024)))
+    QUERY_CACHE_TTL = float(os.getenv('QUERY_CACHE_TTL', "86400"))
+    QUERY_CACHE_PATH = os.getenv('QUERY_CACHE_PATH', "")  # e.g. data/query_cache.sqlite3
+    QUERY_CACHE_MAX_ROWS = int(os.getenv('QUERY_CACHE_MAX_ROWS', "100000"))  # newest rows kept in the SQLite file
+    CHUNK_MAX_TOKENS = int(os.getenv('CHUNK_MAX_TOKENS', "0"))  # 0 = embedding model's max sequence length
+    CHUNK_OVERLAP_TOKENS = int(os.getenv('CHUNK_OVERLAP_TOKENS', "32"))
+    RERANK_MODEL = os.getenv('RERANK_MODEL', "")  # e.g. cross-encoder/ms-marco-MiniLM-L-6-v2; empty disables reranking
+    RERANK_CANDIDATES = int(os.getenv('RERANK_CANDIDATES', "50"))
+    RERANK_TOP_N = int(os.getenv('RERANK_TOP_N', "4"))  # passages sent to the LLM after reranking
+    RERANK_TIMEOUT_MS = int(os.getenv('RERANK_TIMEOUT_MS', "500"))
+    RERANK_WORKERS = int(os.getenv('RERANK_WORKERS', "1"))  # concurrent reranks; more requests skip reranking
+    PROMPT_CONTEXT_TOKENS = int(os.getenv('PROMPT_CONTEXT_TOKENS', "1500"))  # passage tokens sent to the LLM
+    PROMPT_DEDUP_THRESHOLD = float(os.getenv('PROMPT_DEDUP_THRESHOLD', "0.95"))  # cosine above which passages are near-duplicates
+    PROMPT_MAX_SENTENCES = int(os.getenv('PROMPT_MAX_SENTENCES', "0"))  # >0 trims passages to their most query-relevant sentences
+    QUERY_BATCH_MAX_SIZE = int(os.getenv('QUERY_BATCH_MAX_SIZE', "32"))
+    QUERY_BATCH_MAX_WAIT_MS = float(os.getenv('QUERY_BATCH_MAX_WAIT_MS', "5"))  # 0 disables micro-batching
+    EXTRACT_WORKERS = int(os.getenv('EXTRACT_WORKERS', "1"))  # >1 extracts pages in parallel
+    EXTRACT_PAGES_PER_TASK = int(os.getenv('EXTRACT_PAGES_PER_TASK', "16"))
+    PIPELINE_QUEUE_SIZE = int(os.getenv('PIPELINE_QUEUE_SIZE', "4"))
+    UPLOAD_DIR = os.getenv('UPLOAD_DIR', "data/uploads")
+    INGEST_WORKERS = int(os.getenv('INGEST_WORKERS', "2"))
+    OLLAMA_MODEL = os.getenv('OLLAMA_MODEL', "llama3")
+    CHAT_BUCKET_MESSAGES = int(os.getenv('CHAT_BUCKET_MESSAGES', "100"))  # messages per chat document before spilling into buckets
+    PAGE_SIZE_DEFAULT = int(os.getenv('PAGE_SIZE_DEFAULT', "50"))  # documents / chats per list page
+    PAGE_SIZE_MAX = int(os.getenv('PAGE_SIZE_MAX', "200"))
+    ANSWER_CACHE_TTL = int(os.getenv('ANSWER_CACHE_TTL', str(7 * 24 * 3600)))
+    SEARCH_BACKEND = os.getenv('SEARCH_BACKEND', "ivf")  # ivf | exact | legacy
+    INDEX_DIR = os.getenv('INDEX_DIR', "data/indexes")
+    IVF_MIN_TRAIN = int(os.getenv('IVF_MIN_TRAIN', "4096"))
+    IVF_NPROBE = int(os.getenv('IVF_NPROBE', "8"))
+    RETRIEVAL_MODE = os.getenv('RETRIEVAL_MODE', "hybrid")  # hybrid | dense
+    HYBRID_CANDIDATES = int(os.getenv('HYBRID_CANDIDATES', "50"))
+    HYBRID_PREFILTER = os.getenv('HYBRID_PREFILTER', "false").lower() == "true"  # true trades recall for speed
+    RRF_K = int(os.getenv('RRF_K', "60"))
+    BM25_K1 = float(os.getenv('BM25_K1', "1.2"))
+    BM25_B = float(os.getenv('BM25_B', "0.75"))
+    BM25_MAX_SEGMENTS = int(os.getenv('BM25_MAX_SEGMENTS', "8"))
@@ -1,14 +1,77 @@
-from pymongo import MongoClient
+import logging
+from pymongo import AsyncMongoClient, MongoClient
 from app.config import Config
 
+logger = logging.getLogger(__name__)
+
 MONGO_URI = Config.MONGO_URI
-client = MongoClient(MONGO_URI)
+POOL_OPTIONS = {
+    "maxPoolSize": Config.MONGO_MAX_POOL_SIZE,
+    "minPoolSize": Config.MONGO_MIN_POOL_SIZE,
+    "maxIdleTimeMS": Config.MONGO_MAX_IDLE_TIME_MS,
+    "waitQueueTimeoutMS": Config.MONGO_WAIT_QUEUE_TIMEOUT_MS,
+    # Connect on the first operation rather than at import time
+    "connect": False,
+}
+
+# Synchronous client: ingestion worker processes and index builds off the event loop
+client = MongoClient(MONGO_URI, **POOL_OPTIONS)
 db = client['knowledge_base']
 
 documents_collection = db['documents']
 passages_collection = db['passages']
 users_collection = db['users']
 chat_history_collection = db['chat_history']
+jobs_collection = db['jobs']
+answer_cache_collection = db['answer_cache']
+embedding_store_collection = db['embedding_store']
+
+# Asynchronous client: everything awaited from request handlers
+async_client = AsyncMongoClient(MONGO_URI, **POOL_OPTIONS)
+async_db = async_client['knowledge_base']
+
+async_documents_collection = async_db['documents']
+async_passages_collection = async_db['passages']
+async_users_collection = async_db['users']
+async_chat_history_collection = async_db['chat_history']
+async_chat_message_buckets_collection = async_db['chat_message_buckets']
+async_jobs_collection = async_db['jobs']
+async_answer_cache_collection = async_db['answer_cache']
+
+# Indexes backing every hot query, created at startup: {collection: [(keys, options)]}
+INDEXES = {
+    'passages': [
+        ([("user_id", 1), ("doc_id", 1)], {}),
+        ([("user_id", 1), ("text_hash", 1)], {}),
+    ],
+    'documents': [
+        ([("user_id", 1), ("_id", 1)], {}),
+        ([("user_id", 1), ("file_hash", 1)], {}),
+    ],
+    'chat_history': [
+        ([("user_id", 1), ("created_at", -1), ("_id", -1)], {}),
+    ],
+    'chat_message_buckets': [
+        ([("chat_id", 1), ("bucket", 1)], {"unique": True}),
+    ],
+    'users': [
+        ([("email", 1)], {"unique": True}),
+    ],
+    'answer_cache': [
+        ([("user_id", 1), ("key", 1)], {"unique": True}),
+        ([("created_at", 1)], {"expireAfterSeconds": Config.ANSWER_CACHE_TTL}),
+    ],
+}
+
+async def ensure_indexes():
+    """Create any missing indexes; existing ones are left untouched."""
+    for name, specs in INDEXES.items():
+        for keys, options in specs:
+            try:
+                await async_db[name].create_index(keys, **options)
+            except Exception as e:
+                # e.g. duplicate emails blocking the unique index: keep serving
+                logger.error(f"Could not create index {keys} on {name}: {e}")
 
 def get_db():
     return db
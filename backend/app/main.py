@@ -1,6 +1,13 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
-from app.routes import upload, query, docs, auth, history
+from app.routes import upload, query, docs, auth, history, jobs
+from app.services.jobs import recover_jobs, shutdown_executor
+from app.services.executor import shutdown_cpu_executor
+from app.services.embeddings import get_query_batcher, get_query_cache
+from app.services.lifecycle import readiness, start_warmup
+from app.services.metrics import collect_request_timings, register_collector, render, server_timing_header
+from app.db.mongo import ensure_indexes
 
 app = FastAPI()
 
@@ -18,7 +25,63 @@ app.include_router(query.router)
 app.include_router(docs.router)
 app.include_router(auth.router)
 app.include_router(history.router)
+app.include_router(jobs.router)
+
+@app.middleware("http")
+async def server_timing(request: Request, call_next):
+    """Report per-stage timings in a Server-Timing header when the client asks for them."""
+    if request.headers.get("X-Server-Timing") != "1":
+        return await call_next(request)
+    timings = collect_request_timings()
+    response = await call_next(request)
+    if timings:
+        response.headers["Server-Timing"] = server_timing_header(timings)
+    return response
+
+def _embedding_stats_lines():
+    lines = []
+    for prefix, stats in (
+        ("kb_query_cache", get_query_cache().stats()),
+        ("kb_query_batch", get_query_batcher().stats())
+    ):
+        for key, value in stats.items():
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                lines.append(f"# TYPE {prefix}_{key} gauge")
+                lines.append(f"{prefix}_{key} {value}")
+    return lines
+
+register_collector(_embedding_stats_lines)
+
+@app.on_event("startup")
+async def startup():
+    await ensure_indexes()
+    await recover_jobs()
+    start_warmup()
+
+@app.on_event("shutdown")
+def shutdown_workers():
+    shutdown_executor()
+    shutdown_cpu_executor()
 
 @app.get("/api/health")
 def health_check():
     return {"status": "ok"}
+
+@app.get("/api/ready")
+def ready_check():
+    """503 until the embedding model (and any preloaded indexes) are warm."""
+    state = readiness()
+    return JSONResponse(state, status_code=200 if state["ready"] else 503)
+
+@app.get("/api/stats/embeddings")
+def embedding_stats():
+    """Query embedding cache and micro-batching counters, for tuning."""
+    return {
+        "query_cache": get_query_cache().stats(),
+        "query_batcher": get_query_batcher().stats()
+    }
+
+@app.get("/api/metrics")
+def metrics():
+    """Prometheus text exposition of latency histograms and pipeline counters."""
+    return PlainTextResponse(render(), media_type="text/plain; version=0.0.4")
@@ -8,12 +8,16 @@ class Document(BaseModel):
     tags: Optional[List[str]] = None
 
 class Passage(BaseModel):
+    id: Optional[str] = None
     doc_id: str
     doc_title: str
     page: int
+    page_end: Optional[int] = None
     text: str
     score: Optional[float] = None
+    rerank_score: Optional[float] = None
 
 class SearchResponse(BaseModel):
     answer: str
     sources: List[Passage]
+    cached: bool = False
@@ -29,6 +29,9 @@ class ChatHistory(BaseModel):
     created_at: Optional[str] = None
     updated_at: Optional[str] = None
 
+class ChatAppend(BaseModel):
+    messages: list
+
 class ChatMessage(BaseModel):
     role: str  # 'user' or 'assistant'
     content: str
@@ -7,7 +7,7 @@ router = APIRouter(prefix="/api/auth", tags=["auth"])
 @router.post("/register", response_model=TokenResponse)
 async def register(user_data: UserRegister):
     """Register a new user."""
-    result = register_user(user_data.email, user_data.password, user_data.name)
+    result = await register_user(user_data.email, user_data.password, user_data.name)
     
     if "error" in result:
         raise HTTPException(status_code=400, detail=result["error"])
@@ -17,7 +17,7 @@ async def register(user_data: UserRegister):
 @router.post("/login", response_model=TokenResponse)
 async def login(user_data: UserLogin):
     """Login a user."""
-    result = login_user(user_data.email, user_data.password)
+    result = await login_user(user_data.email, user_data.password)
     
     if "error" in result:
         raise HTTPException(status_code=401, detail=result["error"])
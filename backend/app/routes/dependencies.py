@@ -0,0 +1,21 @@
+from fastapi import HTTPException, Header
+from typing import Optional
+from app.services.auth_service import verify_token
+from app.services.metrics import timed
+
+async def get_current_user_id(authorization: Optional[str] = Header(None)) -> str:
+    """Dependency for protected routes: the user id from a valid Bearer token, else 401."""
+    if not authorization:
+        raise HTTPException(status_code=401, detail="Authorization header missing")
+
+    try:
+        token = authorization.split(" ")[1]
+    except IndexError:
+        raise HTTPException(status_code=401, detail="Invalid authorization header")
+
+    with timed("request", "auth"):
+        user_id = verify_token(token)
+    if not user_id:
+        raise HTTPException(status_code=401, detail="Invalid or expired token")
+
+    return user_id
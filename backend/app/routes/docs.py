@@ -1,24 +1,42 @@
-from fastapi import APIRouter, HTTPException
-from app.db.mongo import documents_collection
+from fastapi import APIRouter, HTTPException, Depends
+from fastapi.responses import StreamingResponse
+from app.db.mongo import async_documents_collection
+from app.routes.dependencies import get_current_user_id
+from app.services.vectorstore import list_documents as iter_documents
+from app.utils.pagination import decode_cursor, encode_cursor, page_size, stream_json_page
 from bson import ObjectId
-from typing import List
+from typing import List, Optional
 
 router = APIRouter()
 
 @router.get("/api/documents")
-async def list_documents():
-    docs = []
-    for doc in documents_collection.find():
-        docs.append({
-            "id": str(doc["_id"]),
-            "title": doc["title"]
-        })
-    return docs
+async def list_documents(
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    user_id: str = Depends(get_current_user_id)
+):
+    """One page of the user's documents; pass next_cursor back to get the next page."""
+    limit = page_size(limit)
+    after = None
+    if cursor:
+        try:
+            (after,) = decode_cursor(cursor)
+            ObjectId(after)
+        except Exception:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+    
+    return StreamingResponse(
+        stream_json_page(
+            iter_documents(user_id, limit + 1, after), "documents", limit,
+            lambda doc: encode_cursor(doc["id"])
+        ),
+        media_type="application/json"
+    )
 
 @router.get("/api/documents/{id}")
 async def get_document(id: str):
     try:
-        doc = documents_collection.find_one({"_id": ObjectId(id)})
+        doc = await async_documents_collection.find_one({"_id": ObjectId(id)})
         if doc:
             return {
                 "id": str(doc["_id"]),
@@ -1,56 +1,72 @@
-from fastapi import APIRouter, HTTPException, Header
+from fastapi import APIRouter, HTTPException, Depends
+from fastapi.responses import StreamingResponse
 from typing import Optional
-from app.services.auth_service import verify_token, save_chat_history, get_chat_history, get_chat_by_id, delete_chat
-from app.models.user_models import ChatHistory
+from bson.objectid import ObjectId
+from app.routes.dependencies import get_current_user_id
+from app.services.auth_service import (
+    save_chat_history, append_chat_messages, get_chat_history, get_chat_by_id, delete_chat
+)
+from app.models.user_models import ChatAppend, ChatHistory
+from app.utils.pagination import decode_cursor, encode_cursor, page_size, stream_json_page
 
 router = APIRouter(prefix="/api/history", tags=["history"])
 
-def get_user_id_from_token(authorization: Optional[str] = Header(None)):
-    """Extract and verify user ID from authorization header."""
-    if not authorization:
-        raise HTTPException(status_code=401, detail="Authorization header missing")
-    
-    try:
-        token = authorization.split(" ")[1]
-    except IndexError:
-        raise HTTPException(status_code=401, detail="Invalid authorization header")
-    
-    user_id = verify_token(token)
-    if not user_id:
-        raise HTTPException(status_code=401, detail="Invalid or expired token")
-    
-    return user_id
-
 @router.post("/save")
-async def save_history(chat: ChatHistory, authorization: Optional[str] = Header(None)):
+async def save_history(chat: ChatHistory, user_id: str = Depends(get_current_user_id)):
     """Save a chat to history."""
-    user_id = get_user_id_from_token(authorization)
-    
-    chat_id = save_chat_history(user_id, chat.title, chat.messages)
+    chat_id = await save_chat_history(user_id, chat.title, chat.messages)
     
     return {
         "id": chat_id,
         "message": "Chat saved successfully"
     }
 
-@router.get("/list")
-async def list_history(authorization: Optional[str] = Header(None)):
-    """Get all chat histories for the user."""
-    user_id = get_user_id_from_token(authorization)
+@router.post("/{chat_id}/messages")
+async def append_history(chat_id: str, chat: ChatAppend, user_id: str = Depends(get_current_user_id)):
+    """Append only the new messages of a turn to a saved chat."""
+    message_count = await append_chat_messages(chat_id, user_id, chat.messages)
     
-    chats = get_chat_history(user_id)
+    if message_count is None:
+        raise HTTPException(status_code=404, detail="Chat not found")
     
     return {
-        "chats": chats,
-        "count": len(chats)
+        "id": chat_id,
+        "message_count": message_count
     }
 
-@router.get("/{chat_id}")
-async def get_history(chat_id: str, authorization: Optional[str] = Header(None)):
-    """Get a specific chat by ID."""
-    user_id = get_user_id_from_token(authorization)
+@router.get("/list")
+async def list_history(
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    user_id: str = Depends(get_current_user_id)
+):
+    """One page of the user's chats, newest first; pass next_cursor back for the next page."""
+    limit = page_size(limit)
+    before = None
+    if cursor:
+        try:
+            created_at, chat_id = decode_cursor(cursor)
+            before = (str(created_at), str(ObjectId(chat_id)))
+        except Exception:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
     
-    chat = get_chat_by_id(chat_id, user_id)
+    return StreamingResponse(
+        stream_json_page(
+            get_chat_history(user_id, limit + 1, before), "chats", limit,
+            lambda chat: encode_cursor(chat["created_at"], chat["id"])
+        ),
+        media_type="application/json"
+    )
+
+@router.get("/{chat_id}")
+async def get_history(
+    chat_id: str,
+    offset: int = 0,
+    limit: Optional[int] = None,
+    user_id: str = Depends(get_current_user_id)
+):
+    """Get a specific chat by ID with one page of its messages, from `offset`."""
+    chat = await get_chat_by_id(chat_id, user_id, max(offset, 0), page_size(limit))
     
     if not chat:
         raise HTTPException(status_code=404, detail="Chat not found")
@@ -58,11 +74,9 @@ async def get_history(chat_id: str, authorization: Optional[str] = Header(None))
     return chat
 
 @router.delete("/{chat_id}")
-async def delete_history(chat_id: str, authorization: Optional[str] = Header(None)):
+async def delete_history(chat_id: str, user_id: str = Depends(get_current_user_id)):
     """Delete a chat."""
-    user_id = get_user_id_from_token(authorization)
-    
-    success = delete_chat(chat_id, user_id)
+    success = await delete_chat(chat_id, user_id)
     
     if not success:
         raise HTTPException(status_code=404, detail="Chat not found")
@@ -0,0 +1,19 @@
+from fastapi import APIRouter, HTTPException, Depends
+from bson.errors import InvalidId
+from app.routes.dependencies import get_current_user_id
+from app.services.jobs import get_job
+
+router = APIRouter(prefix="/api/jobs", tags=["jobs"])
+
+@router.get("/{job_id}")
+async def get_job_status(job_id: str, user_id: str = Depends(get_current_user_id)):
+    """Get the progress of an ingestion job."""
+    try:
+        job = await get_job(job_id, user_id)
+    except InvalidId:
+        raise HTTPException(status_code=400, detail="Invalid job ID")
+    
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    return job
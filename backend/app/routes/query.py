@@ -1,43 +1,60 @@
-from fastapi import APIRouter, HTTPException, Header
-from typing import Optional
+from fastapi import APIRouter, HTTPException, Depends
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
+import json
+import logging
+import time
 from app.services.vectorstore import vector_search
-from app.services.ollama_client import generate_answer
-from app.utils.prompt_builder import build_rag_prompt, clean_answer
-from app.models.pydantic_models import SearchResponse
-from app.services.auth_service import verify_token
+from app.services.ollama_client import generate_answer, stream_answer, FALLBACK_ANSWER
+from app.utils.prompt_builder import build_rag_prompt, clean_answer, AnswerCleaner
+from app.models.pydantic_models import SearchResponse, Passage
+from app.routes.dependencies import get_current_user_id
+from app.services.answer_cache import make_answer_key, get_cached_answer, cache_answer
+from app.services.context import assemble_context
+from app.services.executor import run_cpu
+from app.services.reranker import rerank, rerank_enabled
+from app.services.metrics import record_stage, timed
+from app.config import Config
 
 router = APIRouter()
+logger = logging.getLogger(__name__)
+
+async def _retrieve(q: str, user_id: str, top_k: int):
+    """Passages for the prompt, best first: cosine top_k, or a reranked wider pool."""
+    if not rerank_enabled():
+        return await vector_search(q, user_id, top_k)
+    candidates = await vector_search(q, user_id, max(Config.RERANK_CANDIDATES, top_k))
+    with timed("search", "rerank"):
+        return await rerank(q, candidates, min(Config.RERANK_TOP_N, top_k))
 
 @router.get("/api/search", response_model=SearchResponse)
 async def search_query(
     q: str,
     top_k: int = 8,
-    authorization: Optional[str] = Header(None)
+    user_id: str = Depends(get_current_user_id)
 ):
     if not q:
         raise HTTPException(status_code=400, detail="Query cannot be empty")
 
-    # Get user_id from token
-    if not authorization:
-        raise HTTPException(status_code=401, detail="Authorization header missing")
-    
-    try:
-        token = authorization.split(" ")[1]
-    except IndexError:
-        raise HTTPException(status_code=401, detail="Invalid authorization header")
-    
-    user_id = verify_token(token)
-    if not user_id:
-        raise HTTPException(status_code=401, detail="Invalid or expired token")
-
     try:
         # Search for relevant passages (get more to ensure quality)
-        retrieved_passages = vector_search(q, user_id, top_k)
+        retrieved_passages = await _retrieve(q, user_id, top_k)
         if not retrieved_passages:
             return SearchResponse(answer="I don't have this information in the documents.", sources=[])
 
-        prompt = build_rag_prompt(q, retrieved_passages)
-        answer = generate_answer(prompt)
+        # Identical question over the same passages: reuse the stored answer
+        cache_key = make_answer_key(q, [p['id'] for p in retrieved_passages], Config.OLLAMA_MODEL)
+        with timed("search", "answer_cache"):
+            cached = await get_cached_answer(user_id, cache_key)
+        if cached:
+            return SearchResponse(answer=cached['answer'], sources=cached['sources'], cached=True)
+
+        with timed("search", "prompt"):
+            context = await run_cpu(assemble_context, q, retrieved_passages, user_id)
+            prompt = build_rag_prompt(q, context)
+        with timed("search", "llm"):
+            answer = await generate_answer(prompt)
+        generated = answer != FALLBACK_ANSWER
         
         # Clean and format the answer
         answer = clean_answer(answer)
@@ -45,6 +62,79 @@ async def search_query(
         # Only return top 3 most relevant sources to user (not all 8)
         top_sources = retrieved_passages[:3]
         
+        if generated:
+            await cache_answer(user_id, cache_key, answer, top_sources)
         return SearchResponse(answer=answer, sources=top_sources)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+def _sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@router.get("/api/search/stream")
+async def search_query_stream(
+    q: str,
+    top_k: int = 8,
+    user_id: str = Depends(get_current_user_id)
+):
+    """Server-sent events: `sources` right after retrieval, then `token` events, then `done`."""
+    if not q:
+        raise HTTPException(status_code=400, detail="Query cannot be empty")
+
+    try:
+        retrieved_passages = await _retrieve(q, user_id, top_k)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    async def events():
+        if not retrieved_passages:
+            yield _sse("sources", [])
+            yield _sse("token", {"text": "I don't have this information in the documents."})
+            yield _sse("done", {"cached": False})
+            return
+
+        top_sources = retrieved_passages[:3]
+        yield _sse("sources", jsonable_encoder([Passage(**p) for p in top_sources]))
+
+        cache_key = make_answer_key(q, [p['id'] for p in retrieved_passages], Config.OLLAMA_MODEL)
+        with timed("search", "answer_cache"):
+            cached = await get_cached_answer(user_id, cache_key)
+        if cached:
+            yield _sse("token", {"text": cached['answer']})
+            yield _sse("done", {"cached": True})
+            return
+
+        with timed("search", "prompt"):
+            context = await run_cpu(assemble_context, q, retrieved_passages, user_id)
+            prompt = build_rag_prompt(q, context)
+        cleaner = AnswerCleaner()
+        parts = []
+        started = time.perf_counter()
+        first = True
+        try:
+            async for fragment in stream_answer(prompt):
+                if first:
+                    record_stage("search", "llm_first_token", time.perf_counter() - started)
+                    first = False
+                text = cleaner.feed(fragment)
+                if text:
+                    parts.append(text)
+                    yield _sse("token", {"text": text})
+        except Exception as e:
+            logger.error(f"Error streaming from Ollama: {e}")
+            yield _sse("error", {"detail": FALLBACK_ANSWER})
+            return
+        record_stage("search", "llm", time.perf_counter() - started)
+
+        text = cleaner.flush()
+        if text:
+            parts.append(text)
+            yield _sse("token", {"text": text})
+        await cache_answer(user_id, cache_key, "".join(parts), top_sources)
+        yield _sse("done", {"cached": False})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
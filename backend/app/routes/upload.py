@@ -1,33 +1,25 @@
-from fastapi import APIRouter, UploadFile, File, Form, HTTPException, Header
-from typing import Optional
+from fastapi import APIRouter, UploadFile, File, Form, HTTPException, Depends
+import hashlib
 import logging
-from io import BytesIO
-from app.services.extractor import extract_text_from_pdf
-from app.services.vectorstore import create_document_and_passages
-from app.services.auth_service import verify_token
+import os
+import uuid
+from app.config import Config
+from app.services.jobs import create_job, submit_job
+from app.services.vectorstore import find_document_by_hash
+from app.routes.dependencies import get_current_user_id
+from app.services.metrics import timed
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
 @router.post("/api/upload")
 async def upload_document(
     title: str = Form(...),
     file: UploadFile = File(...),
-    authorization: Optional[str] = Header(None)
+    user_id: str = Depends(get_current_user_id)
 ):
-    # Get user_id from token
-    if not authorization:
-        raise HTTPException(status_code=401, detail="Authorization header missing")
-    
-    try:
-        token = authorization.split(" ")[1]
-    except IndexError:
-        raise HTTPException(status_code=401, detail="Invalid authorization header")
-    
-    user_id = verify_token(token)
-    if not user_id:
-        raise HTTPException(status_code=401, detail="Invalid or expired token")
-    
     # Check file extension and content type
     if not file.filename.lower().endswith('.pdf'):
         raise HTTPException(status_code=400, detail="Only PDF files are allowed")
@@ -39,20 +31,26 @@ async def upload_document(
         # Still allow it, just log the warning
     
     try:
-        # Read file content
-        file_content = await file.read()
+        # Save the upload for the worker pool, one chunk at a time
+        os.makedirs(Config.UPLOAD_DIR, exist_ok=True)
+        file_path = os.path.join(Config.UPLOAD_DIR, f"{uuid.uuid4().hex}.pdf")
+        digest = hashlib.sha256()
+        with timed("upload", "save"), open(file_path, "wb") as out:
+            while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+                digest.update(chunk)
+                out.write(chunk)
+        file_hash = digest.hexdigest()
         
-        # Create a BytesIO object from the content
-        file_bytes = BytesIO(file_content)
+        # The same file was already ingested for this user: nothing to do
+        existing_doc_id = await find_document_by_hash(user_id, file_hash)
+        if existing_doc_id:
+            os.remove(file_path)
+            job_id = await create_job(user_id, title, None, file_hash, duplicate_of=existing_doc_id)
+            return {"job_id": job_id, "status": "completed", "doc_id": existing_doc_id, "duplicate": True}
         
-        passages_data = list(extract_text_from_pdf(file_bytes))
-        if not passages_data:
-            raise HTTPException(status_code=400, detail="Could not extract text from PDF")
-
-        doc_id = create_document_and_passages(title, passages_data, user_id)
-        return {"job_id": doc_id, "status": "completed"}
-    except HTTPException:
-        raise
+        job_id = await create_job(user_id, title, file_path, file_hash)
+        submit_job(job_id, file_path, title, user_id, file_hash)
+        return {"job_id": job_id, "status": "queued"}
     except Exception as e:
         logger.error(f"Upload error: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"Upload failed: {str(e)}")
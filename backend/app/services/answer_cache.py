@@ -0,0 +1,33 @@
+import hashlib
+from datetime import datetime, timezone
+from app.db.mongo import answer_cache_collection, async_answer_cache_collection
+
+
+def make_answer_key(query: str, passage_ids: list, model: str) -> str:
+    """Fingerprint of the question, the retrieved passages and the LLM."""
+    fingerprint = "\0".join([model, " ".join(query.split()), ",".join(passage_ids)])
+    return hashlib.sha256(fingerprint.encode("utf-8")).hexdigest()
+
+
+async def get_cached_answer(user_id: str, key: str):
+    return await async_answer_cache_collection.find_one(
+        {"user_id": user_id, "key": key},
+        {"_id": 0, "answer": 1, "sources": 1}
+    )
+
+
+async def cache_answer(user_id: str, key: str, answer: str, sources: list):
+    await async_answer_cache_collection.update_one(
+        {"user_id": user_id, "key": key},
+        {"$set": {
+            "answer": answer,
+            "sources": sources,
+            "created_at": datetime.now(timezone.utc)
+        }},
+        upsert=True
+    )
+
+
+def invalidate_user_answers(user_id: str):
+    """Drop a user's cached answers; called whenever their corpus changes."""
+    answer_cache_collection.delete_many({"user_id": user_id})
@@ -1,23 +1,32 @@
 import jwt
 import bcrypt
+import threading
+import time
+from collections import OrderedDict
 from datetime import datetime, timedelta, timezone
 from pytz import timezone as pytz_timezone
 from app.config import Config
-from app.db.mongo import users_collection, chat_history_collection
+from app.services.executor import run_bcrypt
+from app.db.mongo import async_users_collection, async_chat_history_collection, async_chat_message_buckets_collection
 from bson.objectid import ObjectId
+from pymongo import ReturnDocument
 
 SECRET_KEY = Config.SECRET_KEY or "your-secret-key-change-this"
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30 * 24 * 60  # 30 days
 IST = pytz_timezone('Asia/Kolkata')
 
+# token -> (user_id, exp); verified tokens are trusted until they expire
+_token_cache = OrderedDict()
+_token_cache_lock = threading.Lock()
+
 def get_ist_now():
     """Get current time in Indian Standard Time (IST)."""
     return datetime.now(IST)
 
 def hash_password(password: str) -> str:
     """Hash a password using bcrypt."""
-    salt = bcrypt.gensalt()
+    salt = bcrypt.gensalt(rounds=Config.BCRYPT_ROUNDS)
     return bcrypt.hashpw(password.encode('utf-8'), salt).decode('utf-8')
 
 def verify_password(password: str, hashed_password: str) -> bool:
@@ -35,27 +44,46 @@ def create_access_token(user_id: str, expires_delta: timedelta = None) -> str:
     return encoded_jwt
 
 def verify_token(token: str) -> str:
-    """Verify a JWT token and return the user_id."""
+    """Verify a JWT token and return the user_id.
+
+    Valid tokens are cached until their `exp`, so repeat requests skip the
+    decode; invalid ones are not cached.
+    """
+    now = time.time()
+    with _token_cache_lock:
+        cached = _token_cache.get(token)
+        if cached is not None:
+            if cached[1] > now:
+                _token_cache.move_to_end(token)
+                return cached[0]
+            del _token_cache[token]
+    
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         user_id = payload.get("sub")
         if user_id is None:
             return None
-        return user_id
     except jwt.ExpiredSignatureError:
         return None
     except jwt.InvalidTokenError:
         return None
+    
+    if payload.get("exp") is not None and Config.TOKEN_CACHE_SIZE > 0:
+        with _token_cache_lock:
+            _token_cache[token] = (user_id, payload["exp"])
+            while len(_token_cache) > Config.TOKEN_CACHE_SIZE:
+                _token_cache.popitem(last=False)
+    return user_id
 
-def register_user(email: str, password: str, name: str):
+async def register_user(email: str, password: str, name: str):
     """Register a new user."""
     # Check if user already exists
-    existing_user = users_collection.find_one({"email": email})
+    existing_user = await async_users_collection.find_one({"email": email}, {"_id": 1})
     if existing_user:
         return {"error": "User already exists"}
     
     # Hash password and create user
-    hashed_password = hash_password(password)
+    hashed_password = await run_bcrypt(hash_password, password)
     user_data = {
         "email": email,
         "password": hashed_password,
@@ -63,7 +91,7 @@ def register_user(email: str, password: str, name: str):
         "created_at": get_ist_now().isoformat()
     }
     
-    result = users_collection.insert_one(user_data)
+    result = await async_users_collection.insert_one(user_data)
     user_id = str(result.inserted_id)
     
     # Create access token
@@ -80,10 +108,13 @@ def register_user(email: str, password: str, name: str):
         }
     }
 
-def login_user(email: str, password: str):
+async def login_user(email: str, password: str):
     """Login a user."""
-    user = users_collection.find_one({"email": email})
-    if not user or not verify_password(password, user["password"]):
+    user = await async_users_collection.find_one(
+        {"email": email},
+        {"email": 1, "password": 1, "name": 1, "created_at": 1}
+    )
+    if not user or not await run_bcrypt(verify_password, password, user["password"]):
         return {"error": "Invalid email or password"}
     
     user_id = str(user["_id"])
@@ -100,60 +131,149 @@ def login_user(email: str, password: str):
         }
     }
 
-def save_chat_history(user_id: str, title: str, messages: list):
-    """Save a chat conversation to history."""
+def _bucket_of(index: int, inline_capacity: int, bucket_size: int) -> int:
+    """Where message `index` is stored: 0 is the chat document itself, then bucket documents."""
+    if index < inline_capacity:
+        return 0
+    return 1 + (index - inline_capacity) // bucket_size
+
+async def save_chat_history(user_id: str, title: str, messages: list):
+    """Save a new chat conversation to history."""
+    size = Config.CHAT_BUCKET_MESSAGES
     ist_now = get_ist_now().isoformat()
     chat_data = {
         "user_id": user_id,
         "title": title,
-        "messages": messages,
+        "messages": messages[:size],
+        "message_count": len(messages[:size]),
+        "inline_capacity": size,
+        "bucket_size": size,
         "created_at": ist_now,
         "updated_at": ist_now
     }
     
-    result = chat_history_collection.insert_one(chat_data)
-    return str(result.inserted_id)
+    result = await async_chat_history_collection.insert_one(chat_data)
+    chat_id = str(result.inserted_id)
+    if len(messages) > size:
+        await append_chat_messages(chat_id, user_id, messages[size:])
+    return chat_id
 
-def get_chat_history(user_id: str):
-    """Get all chat histories for a user."""
-    chats = list(chat_history_collection.find(
-        {"user_id": user_id},
-        {"messages": 0}  # Don't return full messages in list
-    ).sort("created_at", -1))
+async def append_chat_messages(chat_id: str, user_id: str, messages: list):
+    """Push new messages onto a chat (verify ownership); returns the new message count.
+
+    Only the new messages are written. The first `inline_capacity` messages
+    live in the chat document and later ones in bucket documents of
+    `bucket_size` messages, so no document grows without bound.
+    Returns None when the chat does not exist.
+    """
+    size = Config.CHAT_BUCKET_MESSAGES
+    stored = {"$size": {"$ifNull": ["$messages", []]}}
+    # Reserve positions for the new messages; chats saved before bucketing get their layout here
+    chat = await async_chat_history_collection.find_one_and_update(
+        {"_id": ObjectId(chat_id), "user_id": user_id},
+        [{"$set": {
+            "inline_capacity": {"$ifNull": ["$inline_capacity", {"$max": [size, stored]}]},
+            "bucket_size": {"$ifNull": ["$bucket_size", size]},
+            "message_count": {"$add": [{"$ifNull": ["$message_count", stored]}, len(messages)]},
+            "updated_at": get_ist_now().isoformat()
+        }}],
+        projection={"inline_capacity": 1, "bucket_size": 1, "message_count": 1},
+        return_document=ReturnDocument.AFTER
+    )
+    if not chat:
+        return None
     
-    return [
-        {
+    groups = {}
+    start = chat["message_count"] - len(messages)
+    for index, message in enumerate(messages, start):
+        groups.setdefault(_bucket_of(index, chat["inline_capacity"], chat["bucket_size"]), []).append(message)
+    
+    for bucket, group in groups.items():
+        if bucket == 0:
+            await async_chat_history_collection.update_one(
+                {"_id": chat["_id"]}, {"$push": {"messages": {"$each": group}}}
+            )
+        else:
+            await async_chat_message_buckets_collection.update_one(
+                {"chat_id": chat_id, "bucket": bucket},
+                {"$push": {"messages": {"$each": group}}, "$setOnInsert": {"user_id": user_id}},
+                upsert=True
+            )
+    return chat["message_count"]
+
+async def get_chat_history(user_id: str, limit: int, before: tuple = None):
+    """Yield a user's chats, newest first, starting after the (created_at, id) key `before`."""
+    query = {"user_id": user_id}
+    if before:
+        created_at, chat_id = before
+        query["$or"] = [
+            {"created_at": {"$lt": created_at}},
+            {"created_at": created_at, "_id": {"$lt": ObjectId(chat_id)}}
+        ]
+    cursor = async_chat_history_collection.find(
+        query,
+        {"title": 1, "created_at": 1, "updated_at": 1}  # Don't return full messages in list
+    ).sort([("created_at", -1), ("_id", -1)]).limit(limit)
+    
+    async for chat in cursor:
+        yield {
             "id": str(chat["_id"]),
             "title": chat["title"],
             "created_at": chat["created_at"],
             "updated_at": chat["updated_at"]
         }
-        for chat in chats
-    ]
 
-def get_chat_by_id(chat_id: str, user_id: str):
-    """Get a specific chat by ID (verify ownership)."""
-    chat = chat_history_collection.find_one({
-        "_id": ObjectId(chat_id),
-        "user_id": user_id
-    })
+async def get_chat_by_id(chat_id: str, user_id: str, offset: int = 0, limit: int = 100):
+    """Get a chat with messages[offset:offset + limit] (verify ownership)."""
+    chat = await async_chat_history_collection.find_one(
+        {"_id": ObjectId(chat_id), "user_id": user_id},
+        {
+            "title": 1, "created_at": 1, "updated_at": 1,
+            "message_count": 1, "inline_capacity": 1, "bucket_size": 1,
+            "messages": {"$slice": [offset, limit]}
+        }
+    )
     
     if not chat:
         return None
     
+    messages = chat["messages"]
+    count = chat.get("message_count")
+    if count is None:
+        # Saved before bucketing: every message is inline, count them
+        full = await async_chat_history_collection.find_one({"_id": chat["_id"]}, {"messages": 1})
+        count = len(full["messages"])
+    inline_capacity = chat.get("inline_capacity", count)
+    bucket_size = chat.get("bucket_size", Config.CHAT_BUCKET_MESSAGES)
+    
+    end = min(offset + limit, count)
+    if end > max(offset, inline_capacity):
+        first = _bucket_of(max(offset, inline_capacity), inline_capacity, bucket_size)
+        last = _bucket_of(end - 1, inline_capacity, bucket_size)
+        async for bucket in async_chat_message_buckets_collection.find(
+            {"chat_id": chat_id, "bucket": {"$gte": first, "$lte": last}}
+        ).sort("bucket", 1):
+            base = inline_capacity + (bucket["bucket"] - 1) * bucket_size
+            messages.extend(bucket["messages"][max(offset - base, 0):end - base])
+    
     return {
         "id": str(chat["_id"]),
         "title": chat["title"],
-        "messages": chat["messages"],
+        "messages": messages,
+        "message_count": count,
+        "offset": offset,
+        "next_offset": end if end < count else None,
         "created_at": chat["created_at"],
         "updated_at": chat["updated_at"]
     }
 
-def delete_chat(chat_id: str, user_id: str):
+async def delete_chat(chat_id: str, user_id: str):
     """Delete a chat (verify ownership)."""
-    result = chat_history_collection.delete_one({
+    result = await async_chat_history_collection.delete_one({
         "_id": ObjectId(chat_id),
         "user_id": user_id
     })
     
+    if result.deleted_count:
+        await async_chat_message_buckets_collection.delete_many({"chat_id": chat_id})
     return result.deleted_count > 0
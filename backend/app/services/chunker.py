@@ -0,0 +1,142 @@
+import zlib
+import numpy as np
+from app.config import Config
+from app.services.embeddings import load_model
+from app.utils.text_utils import split_sentences
+from typing import Callable, Iterable, Optional, Tuple
+
+_chunker = None
+
+
+class TokenChunker:
+    """Packs sentences into chunks of at most `max_tokens` tokenizer tokens.
+
+    Chunks end on sentence boundaries and run across pages; each chunk
+    records the range of pages it covers. Consecutive chunks share up to
+    `overlap_tokens` tokens of whole sentences.
+
+    Boundaries are content-defined: a chunk ends at the first anchor (a
+    paragraph break, or a sentence whose hash selects it) once it is at
+    least three quarters full. Anchors depend only on the text around
+    them, so an edit moves chunk boundaries only up to the next anchor
+    both versions share; the chunks after it, and their hashes, are
+    unchanged.
+    """
+
+    # On average one sentence in this many is an anchor
+    anchor_every = 2
+
+    def __init__(self, tokenizer, max_tokens: int, overlap_tokens: int = 0):
+        if not 0 <= overlap_tokens < max_tokens:
+            raise ValueError("overlap_tokens must be >= 0 and smaller than max_tokens")
+        self.tokenizer = tokenizer
+        self.max_tokens = max_tokens
+        self.overlap_tokens = overlap_tokens
+        self.min_tokens = max_tokens * 3 // 4
+
+    def _split_long(self, sentence: str):
+        """Cut a sentence longer than max_tokens into token windows."""
+        offsets = self.tokenizer(
+            sentence, add_special_tokens=False, return_offsets_mapping=True
+        )["offset_mapping"]
+        for i in range(0, len(offsets), self.max_tokens):
+            window = offsets[i:i + self.max_tokens]
+            yield sentence[window[0][0]:window[-1][1]], len(window)
+
+    def _sentences(self, text: str):
+        """Yield (sentence, tokens, ends_paragraph) for one page of text."""
+        sentences = split_sentences(text)
+        if not sentences:
+            return
+        # The end of a page is not a paragraph break; text usually continues
+        sentences[-1] = (sentences[-1][0], False)
+        counts = self.tokenizer([s for s, _ in sentences], add_special_tokens=False)["input_ids"]
+        for (sentence, ends_paragraph), ids in zip(sentences, counts):
+            if len(ids) <= self.max_tokens:
+                yield sentence, len(ids), ends_paragraph
+                continue
+            pieces = list(self._split_long(sentence))
+            for i, (piece, tokens) in enumerate(pieces):
+                yield piece, tokens, ends_paragraph and i == len(pieces) - 1
+
+    def _is_anchor(self, sentence: str, ends_paragraph: bool) -> bool:
+        # crc32, not hash(): boundaries must be the same in every process
+        return ends_paragraph or zlib.crc32(sentence.encode()) % self.anchor_every == 0
+
+    def _pack(self, lengths: np.ndarray, anchors: np.ndarray, final: bool):
+        """Pack sentences over token prefix sums, ending chunks at anchors.
+
+        Returns the (start, end) sentence ranges of every complete chunk and
+        the index of the first sentence still needed for the next chunk.
+        """
+        cumulative = np.concatenate(([0], np.cumsum(lengths)))
+        boundaries = np.flatnonzero(anchors) + 1
+        n = len(lengths)
+        ranges = []
+        start = 0
+        while start < n:
+            if not final and cumulative[n] - cumulative[start] <= self.max_tokens:
+                break  # the next page may still fit into this chunk
+            end = int(np.searchsorted(cumulative, cumulative[start] + self.max_tokens, side="right")) - 1
+            end = max(end, start + 1)
+            # The first anchor past min_tokens; a chunk with none in reach is filled up
+            inside = boundaries[(boundaries > start) & (boundaries < end)]
+            inside = inside[cumulative[inside] - cumulative[start] >= self.min_tokens]
+            if len(inside):
+                end = int(inside[0])
+            ranges.append((start, end))
+            if end == n:
+                return ranges, n
+            overlap_start = int(np.searchsorted(
+                cumulative, cumulative[end] - self.overlap_tokens, side="left"
+            ))
+            start = max(overlap_start, start + 1)
+        return ranges, start
+
+    def chunk_pages(self, pages: Iterable[Tuple[int, str]], on_page: Optional[Callable[[int], None]] = None):
+        """Yield passages {page, page_end, text, tokens} from (page_number, text) pairs."""
+        texts, lengths, paragraph_ends, anchors, page_numbers = [], [], [], [], []
+
+        def emit(final: bool):
+            ranges, keep = self._pack(
+                np.asarray(lengths, dtype=np.int64), np.asarray(anchors, dtype=bool), final
+            )
+            chunks = []
+            for start, end in ranges:
+                parts = []
+                for i in range(start, end):
+                    parts.append(texts[i])
+                    parts.append("\n\n" if paragraph_ends[i] else " ")
+                chunks.append({
+                    "page": page_numbers[start],
+                    "page_end": page_numbers[end - 1],
+                    "text": "".join(parts[:-1]),
+                    "tokens": int(sum(lengths[start:end]))
+                })
+            del texts[:keep], lengths[:keep], paragraph_ends[:keep], anchors[:keep], page_numbers[:keep]
+            return chunks
+
+        for page_num, text in pages:
+            if text:
+                for sentence, tokens, ends_paragraph in self._sentences(text):
+                    texts.append(sentence)
+                    lengths.append(tokens)
+                    paragraph_ends.append(ends_paragraph)
+                    anchors.append(self._is_anchor(sentence, ends_paragraph))
+                    page_numbers.append(page_num)
+                yield from emit(final=False)
+            if on_page:
+                on_page(page_num)
+        yield from emit(final=True)
+
+
+def get_chunker() -> TokenChunker:
+    """Chunker sized for the embedding model, built on first use."""
+    global _chunker
+    if _chunker is None:
+        model = load_model()
+        # Leave room for the [CLS]/[SEP] tokens the model adds
+        limit = model.max_seq_length - 2
+        max_tokens = min(Config.CHUNK_MAX_TOKENS, limit) if Config.CHUNK_MAX_TOKENS else limit
+        _chunker = TokenChunker(model.tokenizer, max_tokens, Config.CHUNK_OVERLAP_TOKENS)
+    return _chunker
@@ -0,0 +1,79 @@
+import numpy as np
+from app.config import Config
+from app.services import vector_index
+from app.services.embeddings import embed_query, embed_texts, load_model
+from app.utils.text_utils import split_sentences
+
+# "[Passage n] (Pages a-b)" header and surrounding newlines
+_PASSAGE_OVERHEAD_TOKENS = 12
+
+
+def count_tokens(texts: list) -> list:
+    """Token counts from the embedding model's tokenizer, a proxy for the LLM's."""
+    if not texts:
+        return []
+    return [len(ids) for ids in load_model().tokenizer(texts, add_special_tokens=False)["input_ids"]]
+
+
+def _drop_near_duplicates(passages: list, user_id: str, threshold: float) -> list:
+    """Keep the best-ranked passage of every group with cosine above threshold."""
+    vectors = vector_index.vectors_for(user_id, [p['id'] for p in passages])
+    similarities = vectors @ vectors.T
+    kept = []
+    for i in range(len(passages)):
+        if not kept or similarities[i, kept].max() < threshold:
+            kept.append(i)
+    return [passages[i] for i in kept]
+
+
+def _trim_to_relevant_sentences(passages: list, query: str, max_sentences: int) -> list:
+    """Cut long passages down to their sentences closest to the query, in original order."""
+    sentence_lists = [[s for s, _ in split_sentences(p['text'])] for p in passages]
+    long_passages = [i for i, sentences in enumerate(sentence_lists) if len(sentences) > max_sentences]
+    if not long_passages:
+        return passages
+
+    # One embedding call for every sentence that needs ranking
+    sentences = [s for i in long_passages for s in sentence_lists[i]]
+    vectors = embed_texts(sentences)
+    vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+    query_vector = embed_query(query)
+    scores = vectors @ (query_vector / max(np.linalg.norm(query_vector), 1e-12))
+
+    trimmed = list(passages)
+    start = 0
+    for i in long_passages:
+        count = len(sentence_lists[i])
+        best = np.sort(np.argsort(-scores[start:start + count])[:max_sentences])
+        trimmed[i] = {**passages[i], 'text': " ".join(sentence_lists[i][j] for j in best), 'tokens': None}
+        start += count
+    return trimmed
+
+
+def assemble_context(query: str, passages: list, user_id: str) -> list:
+    """Choose the passages, in rank order, that go into the RAG prompt.
+
+    Near-duplicates are dropped, passages are optionally trimmed to their
+    most relevant sentences, and the rest are added while they fit into
+    PROMPT_CONTEXT_TOKENS. The best passage is always kept.
+    """
+    if not passages:
+        return []
+    passages = _drop_near_duplicates(passages, user_id, Config.PROMPT_DEDUP_THRESHOLD)
+    if Config.PROMPT_MAX_SENTENCES > 0:
+        passages = _trim_to_relevant_sentences(passages, query, Config.PROMPT_MAX_SENTENCES)
+
+    uncounted = [i for i, p in enumerate(passages) if not p.get('tokens')]
+    tokens = [p.get('tokens') for p in passages]
+    for i, count in zip(uncounted, count_tokens([passages[i]['text'] for i in uncounted])):
+        tokens[i] = count
+
+    selected = []
+    used = 0
+    for passage, count in zip(passages, tokens):
+        cost = count + _PASSAGE_OVERHEAD_TOKENS
+        if selected and used + cost > Config.PROMPT_CONTEXT_TOKENS:
+            continue
+        selected.append(passage)
+        used += cost
+    return selected
@@ -0,0 +1,47 @@
+import numpy as np
+from pymongo.errors import BulkWriteError
+from app.config import Config
+from app.db.mongo import embedding_store_collection
+from app.services.embeddings import embed_texts
+from app.utils.vector_codec import decode_embedding, encode_embedding
+
+
+def _key(text_hash: str) -> str:
+    # Vectors from different models are not interchangeable
+    return f"{Config.EMBEDDING_MODEL}:{text_hash}"
+
+
+def embed_with_store(texts: list, hashes: list, batch_size: int = None):
+    """Embed texts, reusing stored vectors for any text hash seen before.
+
+    Returns (float32 matrix, number of reused vectors). Newly computed
+    vectors are added to the store at full precision.
+    """
+    if not texts:
+        return np.zeros((0, 0), dtype=np.float32), 0
+
+    keys = [_key(h) for h in hashes]
+    found = {
+        doc["_id"]: decode_embedding(doc)
+        for doc in embedding_store_collection.find({"_id": {"$in": list(set(keys))}})
+    }
+    reused = sum(key in found for key in keys)
+
+    missing = {}
+    for key, text in zip(keys, texts):
+        if key not in found:
+            missing.setdefault(key, text)
+    if missing:
+        vectors = embed_texts(list(missing.values()), batch_size)
+        found.update(zip(missing, vectors))
+        try:
+            embedding_store_collection.insert_many(
+                [{"_id": key, **encode_embedding(v, "float32")} for key, v in zip(missing, vectors)],
+                ordered=False
+            )
+        except BulkWriteError as e:
+            # Duplicate keys only mean another worker stored the same text first
+            if any(error["code"] != 11000 for error in e.details["writeErrors"]):
+                raise
+
+    return np.stack([found[key] for key in keys]), reused
@@ -1,15 +1,282 @@
-from sentence_transformers import SentenceTransformer
 from app.config import Config
+from app.services.executor import run_cpu
+from collections import OrderedDict
+import asyncio
+import numpy as np
+import os
+import sqlite3
+import threading
+import time
 
 _model = None
 
 def load_model():
     global _model
     if _model is None:
+        # Imported here: torch takes seconds to import and most callers never need it
+        from sentence_transformers import SentenceTransformer
         _model = SentenceTransformer(Config.EMBEDDING_MODEL)
     return _model
 
-def embed_text(text):
+def embed_texts(texts: list, batch_size: int = None) -> np.ndarray:
+    """Embed many texts in batched encode calls; returns a float32 (n, dim) array."""
     model = load_model()
-    vec = model.encode(text)
-    return vec.tolist()
+    if not texts:
+        return np.empty((0, model.get_sentence_embedding_dimension()), dtype=np.float32)
+    vectors = model.encode(
+        texts,
+        batch_size=batch_size or Config.EMBED_BATCH_SIZE,
+        convert_to_numpy=True,
+        show_progress_bar=False
+    )
+    return np.asarray(vectors, dtype=np.float32)
+
+
+class EmbeddingCache:
+    """LRU + TTL cache of query embeddings, bounded by bytes held in memory.
+
+    Optionally backed by a SQLite file shared by every worker, so a restarted
+    worker starts warm. Entries are keyed by (model name, normalized text).
+    The file is pruned every PRUNE_EVERY writes: expired rows are deleted
+    and only the newest `max_rows` are kept.
+    """
+
+    PRUNE_EVERY = 1000
+
+    def __init__(self, max_bytes: int, ttl_seconds: float, path: str = None, max_rows: int = 100000):
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.max_rows = max_rows
+        self._writes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._db = None
+        if path:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS query_embeddings "
+                "(key TEXT PRIMARY KEY, vector BLOB, created REAL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS query_embeddings_created ON query_embeddings (created)")
+            self._prune(time.time())
+
+    @property
+    def persistent(self) -> bool:
+        return self._db is not None
+
+    @staticmethod
+    def make_key(text: str, model_name: str) -> str:
+        return model_name + "\0" + " ".join(text.split())
+
+    def _entry_size(self, key: str, vector: np.ndarray) -> int:
+        return vector.nbytes + len(key)
+
+    def get(self, key: str):
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                vector, created = entry
+                if now - created <= self.ttl_seconds:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return vector
+                self._remove(key)
+
+            vector = self._load(key, now)
+            if vector is not None:
+                self._insert(key, vector, now)
+                self.hits += 1
+                return vector
+
+            self.misses += 1
+            return None
+
+    def put(self, key: str, vector: np.ndarray):
+        now = time.time()
+        with self._lock:
+            self._insert(key, vector, now)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO query_embeddings VALUES (?, ?, ?)",
+                    (key, vector.tobytes(), now)
+                )
+                self._writes += 1
+                if self._writes % self.PRUNE_EVERY == 0:
+                    self._prune(now)
+
+    def _prune(self, now: float):
+        self._db.execute("DELETE FROM query_embeddings WHERE created < ?", (now - self.ttl_seconds,))
+        self._db.execute(
+            "DELETE FROM query_embeddings WHERE created < ("
+            "SELECT created FROM query_embeddings ORDER BY created DESC LIMIT 1 OFFSET ?)",
+            (self.max_rows - 1,)
+        )
+
+    def _load(self, key: str, now: float):
+        if self._db is None:
+            return None
+        row = self._db.execute(
+            "SELECT vector, created FROM query_embeddings WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None or now - row[1] > self.ttl_seconds:
+            return None
+        return np.frombuffer(row[0], dtype=np.float32)
+
+    def _insert(self, key: str, vector: np.ndarray, created: float):
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = (vector, created)
+        self._bytes += self._entry_size(key, vector)
+        while self._bytes > self.max_bytes and self._entries:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def _remove(self, key: str):
+        vector, _ = self._entries.pop(key)
+        self._bytes -= self._entry_size(key, vector)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "bytes": self._bytes
+            }
+
+
+_query_cache = None
+
+def get_query_cache() -> EmbeddingCache:
+    global _query_cache
+    if _query_cache is None:
+        _query_cache = EmbeddingCache(
+            max_bytes=Config.QUERY_CACHE_MAX_BYTES,
+            ttl_seconds=Config.QUERY_CACHE_TTL,
+            path=Config.QUERY_CACHE_PATH or None,
+            max_rows=Config.QUERY_CACHE_MAX_ROWS
+        )
+    return _query_cache
+
+def embed_query(text: str) -> np.ndarray:
+    """Embed a search query, reusing cached vectors for repeated questions."""
+    cache = get_query_cache()
+    key = cache.make_key(text, Config.EMBEDDING_MODEL)
+    vector = cache.get(key)
+    if vector is None:
+        vector = np.asarray(load_model().encode(text), dtype=np.float32)
+        vector.setflags(write=False)
+        cache.put(key, vector)
+    return vector
+
+
+class QueryBatcher:
+    """Coalesces concurrent query embeddings into one batched encode call.
+
+    Requests arriving within `max_wait_ms` of the first pending one, up to
+    `max_batch` of them, are encoded together on the CPU pool; each caller
+    awaits its own future.
+    """
+
+    def __init__(self, max_batch: int, max_wait_ms: float):
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self._pending = []
+        self._timer = None
+        self.batches = 0
+        self.queries = 0
+        self.max_batch_seen = 0
+        self.batch_sizes = {}
+        self.wait_seconds = 0.0
+        self.encode_seconds = 0.0
+
+    async def embed(self, text: str) -> np.ndarray:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((text, future, time.perf_counter()))
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            asyncio.get_running_loop().create_task(self._run(batch))
+
+    async def _run(self, batch: list):
+        started = time.perf_counter()
+        # Identical questions in one batch are encoded once
+        unique = list(dict.fromkeys(text for text, _, _ in batch))
+        try:
+            vectors = await run_cpu(embed_texts, unique, len(unique))
+        except Exception as e:
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        finished = time.perf_counter()
+
+        by_text = {text: vector.copy() for text, vector in zip(unique, vectors)}
+        for text, future, _ in batch:
+            if not future.done():
+                future.set_result(by_text[text])
+
+        self.batches += 1
+        self.queries += len(batch)
+        self.max_batch_seen = max(self.max_batch_seen, len(batch))
+        bucket = 1 << (len(batch) - 1).bit_length()  # 1, 2, 4, 8, ...
+        self.batch_sizes[bucket] = self.batch_sizes.get(bucket, 0) + 1
+        self.wait_seconds += sum(started - queued for _, _, queued in batch)
+        self.encode_seconds += finished - started
+
+    def stats(self) -> dict:
+        return {
+            "batches": self.batches,
+            "queries": self.queries,
+            "mean_batch_size": self.queries / self.batches if self.batches else 0.0,
+            "max_batch_size": self.max_batch_seen,
+            "batch_size_histogram": {f"<={size}": count for size, count in sorted(self.batch_sizes.items())},
+            "mean_wait_ms": self.wait_seconds / self.queries * 1000 if self.queries else 0.0,
+            "mean_encode_ms": self.encode_seconds / self.batches * 1000 if self.batches else 0.0
+        }
+
+
+_query_batcher = None
+
+def get_query_batcher() -> QueryBatcher:
+    global _query_batcher
+    if _query_batcher is None:
+        _query_batcher = QueryBatcher(Config.QUERY_BATCH_MAX_SIZE, Config.QUERY_BATCH_MAX_WAIT_MS)
+    return _query_batcher
+
+async def embed_query_async(text: str) -> np.ndarray:
+    """embed_query for request handlers: cache misses are micro-batched across requests."""
+    if Config.QUERY_BATCH_MAX_WAIT_MS <= 0:
+        return await run_cpu(embed_query, text)
+
+    cache = get_query_cache()
+    key = cache.make_key(text, Config.EMBEDDING_MODEL)
+    # A disk-backed cache does SQLite reads and writes: keep them off the event loop
+    vector = await run_cpu(cache.get, key) if cache.persistent else cache.get(key)
+    if vector is None:
+        vector = await get_query_batcher().embed(text)
+        vector.setflags(write=False)
+        if cache.persistent:
+            await run_cpu(cache.put, key, vector)
+        else:
+            cache.put(key, vector)
+    return vector
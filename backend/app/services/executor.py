@@ -0,0 +1,41 @@
+import asyncio
+import contextvars
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from app.config import Config
+
+# Bounded pool for CPU-bound work (embedding, scoring) awaited from request
+# handlers. NumPy and torch release the GIL inside their kernels, so threads
+# run in parallel while the event loop stays free.
+_executor = ThreadPoolExecutor(max_workers=Config.CPU_WORKERS, thread_name_prefix="cpu")
+
+# Separate small pool for password hashing, so a login storm queues here
+# instead of occupying the threads searches need
+_bcrypt_executor = ThreadPoolExecutor(max_workers=Config.BCRYPT_WORKERS, thread_name_prefix="bcrypt")
+
+# Cross-encoder reranking gets its own pool too: a slow rerank cannot hold
+# threads that embedding and scoring need
+_rerank_executor = ThreadPoolExecutor(max_workers=Config.RERANK_WORKERS, thread_name_prefix="rerank")
+
+async def _run_in(executor, fn, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    # Carry context variables (per-request stage timings) into the worker thread
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(executor, functools.partial(context.run, fn, *args, **kwargs))
+
+async def run_cpu(fn, *args, **kwargs):
+    """Run fn(*args, **kwargs) on the CPU pool and await its result."""
+    return await _run_in(_executor, fn, *args, **kwargs)
+
+async def run_bcrypt(fn, *args, **kwargs):
+    """Run a bcrypt call on its own pool; at most BCRYPT_WORKERS run at once."""
+    return await _run_in(_bcrypt_executor, fn, *args, **kwargs)
+
+async def run_rerank(fn, *args, **kwargs):
+    """Run a cross-encoder call on the rerank pool (RERANK_WORKERS threads)."""
+    return await _run_in(_rerank_executor, fn, *args, **kwargs)
+
+def shutdown_cpu_executor():
+    _executor.shutdown(wait=False, cancel_futures=True)
+    _bcrypt_executor.shutdown(wait=False, cancel_futures=True)
+    _rerank_executor.shutdown(wait=False, cancel_futures=True)
@@ -1,14 +1,87 @@
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from pypdf import PdfReader
-from app.utils.text_utils import chunk_text
-from typing import IO
+from app.config import Config
+from app.services.chunker import get_chunker
+from typing import IO, Callable, Iterable, Optional, Tuple
 
-def extract_text_from_pdf(file: IO):
+_pool = None
+
+
+def count_pages(file: IO) -> int:
+    return len(PdfReader(file).pages)
+
+def iter_pages(file: IO):
+    """Yield (page_number, text) for each page, one page at a time."""
     reader = PdfReader(file)
     for page_num, page in enumerate(reader.pages):
-        text = page.extract_text()
-        if text:
-            for chunk in chunk_text(text):
-                yield {
-                    "page": page_num + 1,
-                    "text": chunk
-                }
+        yield page_num + 1, page.extract_text()
+
+def _extract_page_range(file_path: str, start: int, end: int):
+    """Worker task: open the file independently and extract pages [start, end)."""
+    reader = PdfReader(file_path)
+    return [(i + 1, reader.pages[i].extract_text()) for i in range(start, end)]
+
+def _get_pool(workers: int) -> ProcessPoolExecutor:
+    """The process's extraction pool, started on first use and kept for later documents.
+
+    Spawning workers costs an interpreter start and the app imports each, far
+    more than extracting a typical PDF, so it is paid once per ingestion worker.
+    """
+    global _pool
+    if _pool is not None and _pool._max_workers != workers:
+        _pool.shutdown(wait=False)
+        _pool = None
+    if _pool is None:
+        _pool = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn")
+        )
+    return _pool
+
+
+def iter_pages_parallel(file_path: str, workers: int = None, pages_per_task: int = None):
+    """Yield (page_number, text) in page order, extracting across worker processes.
+
+    Each worker opens the file from its path, so no page data is pickled on
+    the way in. At most two tasks per worker are in flight, which keeps the
+    number of buffered pages bounded when the consumer is slower. A file
+    that fits in one task is extracted in this process.
+    """
+    global _pool
+    workers = workers or Config.EXTRACT_WORKERS
+    pages_per_task = pages_per_task or Config.EXTRACT_PAGES_PER_TASK
+    with open(file_path, "rb") as f:
+        total = count_pages(f)
+    if total <= pages_per_task:
+        yield from _extract_page_range(file_path, 0, total)
+        return
+
+    ranges = [(start, min(start + pages_per_task, total)) for start in range(0, total, pages_per_task)]
+    pool = _get_pool(workers)
+    pending = []
+    next_range = 0
+    try:
+        while next_range < len(ranges) or pending:
+            while next_range < len(ranges) and len(pending) < 2 * workers:
+                start, end = ranges[next_range]
+                pending.append(pool.submit(_extract_page_range, file_path, start, end))
+                next_range += 1
+            yield from pending.pop(0).result()
+    except BrokenProcessPool:
+        # A worker died (e.g. OOM on a huge page); start a fresh pool next time
+        if _pool is pool:
+            _pool = None
+        raise
+    finally:
+        # The pool outlives this document: don't leave its unread tasks running
+        for future in pending:
+            future.cancel()
+
+def chunk_pages(pages: Iterable[Tuple[int, str]], on_page: Optional[Callable[[int], None]] = None):
+    """Split extracted page text into token-bounded passages that may span pages."""
+    return get_chunker().chunk_pages(pages, on_page)
+
+def extract_text_from_pdf(file: IO, on_page: Optional[Callable[[int], None]] = None):
+    return chunk_pages(iter_pages(file), on_page)
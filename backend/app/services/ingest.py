@@ -0,0 +1,154 @@
+import queue
+import threading
+import time
+from app.config import Config
+from app.services.embedding_store import embed_with_store
+from app.services.extractor import chunk_pages, extract_text_from_pdf, iter_pages_parallel
+from app.services.vectorstore import (
+    batched, create_document, discard_document, insert_passage_batch, known_text_hashes, mark_document_complete,
+    unique_passages
+)
+
+_DONE = object()
+
+
+class _StageError:
+    def __init__(self, error: BaseException):
+        self.error = error
+
+
+def _put(out_queue: queue.Queue, item, stop: threading.Event) -> bool:
+    """Block until there is room downstream (backpressure) or the pipeline stops."""
+    while not stop.is_set():
+        try:
+            out_queue.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def _drain(in_queue: queue.Queue, stop: threading.Event):
+    """Yield items from an upstream stage until it finishes, re-raising its errors.
+
+    Also returns once the pipeline stops, since an upstream stage that saw
+    the stop never sends _DONE.
+    """
+    while True:
+        try:
+            item = in_queue.get(timeout=0.1)
+        except queue.Empty:
+            if stop.is_set():
+                return
+            continue
+        if item is _DONE:
+            return
+        if isinstance(item, _StageError):
+            raise item.error
+        yield item
+
+
+def _start_stage(produce, stop: threading.Event) -> queue.Queue:
+    """Run `produce()` in a thread feeding a bounded queue; return that queue."""
+    out_queue = queue.Queue(maxsize=Config.PIPELINE_QUEUE_SIZE)
+
+    def run():
+        try:
+            for item in produce():
+                if not _put(out_queue, item, stop):
+                    return
+            _put(out_queue, _DONE, stop)
+        except BaseException as e:
+            _put(out_queue, _StageError(e), stop)
+
+    threading.Thread(target=run, daemon=True).start()
+    return out_queue
+
+
+def _timed_iter(items, stage_seconds: dict, stage: str):
+    """Yield from `items`, adding the time spent producing them to stage_seconds[stage]."""
+    items = iter(items)
+    while True:
+        start = time.perf_counter()
+        try:
+            item = next(items)
+        except StopIteration:
+            return
+        finally:
+            stage_seconds[stage] = stage_seconds.get(stage, 0.0) + time.perf_counter() - start
+        yield item
+
+
+def ingest_pdf(file_path: str, title: str, user_id: str, on_page=None, on_progress=None,
+               file_hash: str = None, stage_seconds: dict = None, on_document=None):
+    """Stream a PDF through extract -> embed -> insert with bounded queues.
+
+    Each stage runs in its own thread and holds at most PIPELINE_QUEUE_SIZE
+    batches, so peak memory depends on the batch size rather than on the
+    number of pages. Repeated chunks within the file, and chunks the user
+    already has stored (e.g. the unchanged parts of a revised manual), are
+    not stored again; chunks already in the embedding store are not
+    re-embedded. Skipped chunks count as reused.
+    Returns (doc_id, chunk_count, token_count, reused_count); doc_id is None
+    when no text could be extracted. Busy seconds per stage (extract, embed,
+    insert) are added to `stage_seconds` when given. `on_document`
+    gets the doc_id as soon as the document row exists.
+
+    If ingestion fails, the partial document and its passages are deleted,
+    so nothing half-ingested is searchable and a retry starts clean.
+    """
+    if stage_seconds is None:
+        stage_seconds = {}
+    stop = threading.Event()
+    batch_size = Config.EMBED_BATCH_SIZE
+
+    with open(file_path, "rb") as f:
+        def extract():
+            if Config.EXTRACT_WORKERS > 1:
+                passages = chunk_pages(iter_pages_parallel(file_path), on_page=on_page)
+            else:
+                passages = extract_text_from_pdf(f, on_page=on_page)
+            return batched(_timed_iter(unique_passages(passages, set()), stage_seconds, "extract"), batch_size)
+
+        def embed():
+            for batch in _drain(extracted, stop):
+                start = time.perf_counter()
+                known = known_text_hashes(user_id, [p['text_hash'] for p in batch])
+                fresh = [p for p in batch if p['text_hash'] not in known]
+                embeddings, reused = embed_with_store(
+                    [p['text'] for p in fresh], [p['text_hash'] for p in fresh], batch_size
+                )
+                stage_seconds["embed"] = stage_seconds.get("embed", 0.0) + time.perf_counter() - start
+                yield batch, fresh, embeddings, reused + len(batch) - len(fresh)
+
+        extracted = _start_stage(extract, stop)
+        embedded = _start_stage(embed, stop)
+
+        doc_id = None
+        done = tokens = reused_total = 0
+        try:
+            for batch, fresh, embeddings, reused in _drain(embedded, stop):
+                start = time.perf_counter()
+                if doc_id is None:
+                    doc_id = create_document(title, user_id)
+                    if on_document:
+                        on_document(doc_id)
+                if fresh:
+                    insert_passage_batch(doc_id, title, user_id, fresh, embeddings)
+                stage_seconds["insert"] = stage_seconds.get("insert", 0.0) + time.perf_counter() - start
+                done += len(batch)
+                tokens += sum(p['tokens'] for p in batch)
+                reused_total += reused
+                if on_progress:
+                    on_progress(done)
+        except BaseException:
+            stop.set()
+            if doc_id is not None:
+                discard_document(doc_id, user_id)
+            raise
+        finally:
+            stop.set()
+
+    if doc_id is not None:
+        mark_document_complete(doc_id, file_hash, done, tokens)
+    return doc_id, done, tokens, reused_total
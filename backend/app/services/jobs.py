@@ -0,0 +1,273 @@
+import logging
+import multiprocessing
+import os
+import socket
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from bson.objectid import ObjectId
+from app.config import Config
+from app.db.mongo import jobs_collection, async_jobs_collection
+from app.services.auth_service import get_ist_now
+from app.services.extractor import count_pages
+from app.services.ingest import ingest_pdf
+from app.services.metrics import CHUNKS_EMBEDDED, CHUNKS_PER_UPLOAD, CHUNKS_REUSED, record_stage
+from app.services.vectorstore import discard_document
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+
+
+def get_executor() -> ProcessPoolExecutor:
+    """Return the shared ingestion worker pool, starting it on first use."""
+    global _executor
+    if _executor is None:
+        # spawn, not fork: pymongo clients and torch threads are not fork-safe
+        _executor = ProcessPoolExecutor(
+            max_workers=Config.INGEST_WORKERS,
+            mp_context=multiprocessing.get_context("spawn")
+        )
+    return _executor
+
+
+def shutdown_executor():
+    global _executor
+    if _executor is not None:
+        # Jobs still queued are cancelled; their callbacks mark them failed
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+def _discard_executor(executor: ProcessPoolExecutor):
+    """Drop a broken pool (a worker died, e.g. OOM) so the next job starts a fresh one."""
+    global _executor
+    if _executor is executor:
+        _executor = None
+    executor.shutdown(wait=False)
+
+
+def _submitter() -> str:
+    """Identifies the API process that queued a job: host:pid."""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _submitter_alive(submitter: str) -> bool:
+    if submitter == _submitter():
+        # Only asked at startup: a restart reusing our host:pid (e.g. PID 1 in a container)
+        return False
+    host, _, pid = (submitter or "").rpartition(":")
+    if host != socket.gethostname() or os.name == "nt":
+        # Another machine's process (or no cheap liveness check): leave its jobs alone
+        return bool(submitter)
+    try:
+        os.kill(int(pid), 0)
+    except (ValueError, ProcessLookupError):
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _update_job(job_id: str, **fields):
+    fields["updated_at"] = get_ist_now().isoformat()
+    jobs_collection.update_one({"_id": ObjectId(job_id)}, {"$set": fields})
+
+
+def _discard_partial_document(job_id: str):
+    """Delete what a job that died mid-ingestion had stored, so it is not searchable."""
+    job = jobs_collection.find_one({"_id": ObjectId(job_id)}, {"doc_id": 1, "user_id": 1})
+    if job and job.get("doc_id"):
+        discard_document(job["doc_id"], job["user_id"])
+
+
+def _fail_job(job_id: str, file_path: str, error: str):
+    """Mark a job failed and delete its spooled upload."""
+    _update_job(job_id, status="failed", error=error, doc_id=None)
+    if file_path:
+        try:
+            os.remove(file_path)
+        except OSError:
+            pass
+
+
+async def create_job(user_id: str, title: str, file_path: str, file_hash: str = None,
+                     duplicate_of: str = None) -> str:
+    """Record an ingestion job and return its id.
+
+    An upload identical to an existing document is recorded as already
+    completed, pointing at that document.
+    """
+    now = get_ist_now().isoformat()
+    result = await async_jobs_collection.insert_one({
+        "user_id": user_id,
+        "title": title,
+        "file_path": file_path,
+        "file_hash": file_hash,
+        "status": "completed" if duplicate_of else "queued",
+        "duplicate": duplicate_of is not None,
+        "submitter": None if duplicate_of else _submitter(),
+        "pages_total": None,
+        "pages_done": 0,
+        "chunks_embedded": 0,
+        "chunks_reused": 0,
+        "chunks_total": None,
+        "doc_id": duplicate_of,
+        "error": None,
+        "created_at": now,
+        "updated_at": now
+    })
+    return str(result.inserted_id)
+
+
+def run_ingestion_job(job_id: str, file_path: str, title: str, user_id: str, file_hash: str = None):
+    """Extract, embed and insert one uploaded PDF. Runs in a worker process.
+
+    Returns ingestion stats for the API process's metrics, or None on failure.
+    """
+    try:
+        with open(file_path, "rb") as f:
+            _update_job(job_id, status="running", pages_total=count_pages(f))
+
+        started = time.perf_counter()
+        stage_seconds = {}
+        doc_id, chunks, tokens, reused = ingest_pdf(
+            file_path, title, user_id,
+            on_page=lambda page: _update_job(job_id, pages_done=page),
+            on_progress=lambda done: _update_job(job_id, chunks_embedded=done),
+            file_hash=file_hash,
+            stage_seconds=stage_seconds,
+            on_document=lambda doc_id: _update_job(job_id, doc_id=doc_id)
+        )
+        elapsed = time.perf_counter() - started
+
+        if doc_id is None:
+            _update_job(job_id, status="failed", error="Could not extract text from PDF")
+            return None
+
+        _update_job(
+            job_id,
+            status="completed",
+            doc_id=doc_id,
+            chunks_total=chunks,
+            chunks_reused=reused,
+            tokens_total=tokens,
+            chunks_per_sec=round(chunks / elapsed, 1) if elapsed else None,
+            stage_seconds={stage: round(secs, 3) for stage, secs in stage_seconds.items()}
+        )
+        return {"doc_id": doc_id, "chunks": chunks, "reused": reused, "stage_seconds": stage_seconds}
+    except Exception as e:
+        logger.error(f"Ingestion job {job_id} failed: {str(e)}", exc_info=True)
+        # ingest_pdf already deleted the partial document
+        _update_job(job_id, status="failed", error=str(e), doc_id=None)
+        return None
+    finally:
+        try:
+            os.remove(file_path)
+        except OSError:
+            pass
+
+
+def submit_job(job_id: str, file_path: str, title: str, user_id: str, file_hash: str = None):
+    """Queue a job on the worker pool.
+
+    A broken pool is replaced once; if the job still cannot be queued it is
+    marked failed and the error re-raised.
+    """
+    for attempt in range(2):
+        executor = get_executor()
+        try:
+            future = executor.submit(run_ingestion_job, job_id, file_path, title, user_id, file_hash)
+            break
+        except (BrokenProcessPool, RuntimeError) as e:
+            _discard_executor(executor)
+            error = e
+    else:
+        _fail_job(job_id, file_path, f"Could not start ingestion: {error}")
+        raise error
+
+    def _on_done(f):
+        if f.cancelled():
+            _fail_job(job_id, file_path, "Cancelled: the server shut down before the job started")
+        elif f.exception() is not None:
+            if isinstance(f.exception(), BrokenProcessPool):
+                _discard_executor(executor)
+                _discard_partial_document(job_id)
+            # The worker may have died before its own cleanup ran
+            _fail_job(job_id, file_path, str(f.exception()) or type(f.exception()).__name__)
+        elif f.result():
+            # Workers are separate processes; their timings are recorded here
+            stats = f.result()
+            for stage, seconds in stats["stage_seconds"].items():
+                record_stage("upload", stage, seconds)
+            CHUNKS_EMBEDDED.inc(stats["chunks"] - stats["reused"])
+            CHUNKS_REUSED.inc(stats["reused"])
+            CHUNKS_PER_UPLOAD.observe(stats["chunks"])
+
+    future.add_done_callback(_on_done)
+    return future
+
+
+async def recover_jobs():
+    """Resolve jobs orphaned by a restart or crash of the API process that queued them.
+
+    Queued jobs whose upload is still on disk are queued again; jobs that
+    were mid-ingestion are marked failed and the part of their document
+    they had stored is deleted. Each job is claimed atomically, so with
+    several API workers only one of them handles it.
+    """
+    async for job in async_jobs_collection.find(
+        {"status": {"$in": ["queued", "running"]}},
+        {"status": 1, "submitter": 1, "file_path": 1, "title": 1, "user_id": 1, "file_hash": 1}
+    ):
+        if _submitter_alive(job.get("submitter")):
+            continue
+        claimed = await async_jobs_collection.find_one_and_update(
+            {"_id": job["_id"], "status": job["status"], "submitter": job.get("submitter")},
+            {"$set": {"submitter": _submitter(), "updated_at": get_ist_now().isoformat()}}
+        )
+        if not claimed:
+            continue
+
+        job_id = str(job["_id"])
+        file_path = job.get("file_path")
+        if job["status"] == "queued" and file_path and os.path.exists(file_path):
+            logger.info(f"Requeueing ingestion job {job_id} after a restart")
+            try:
+                submit_job(job_id, file_path, job["title"], job["user_id"], job.get("file_hash"))
+            except Exception as e:
+                logger.error(f"Could not requeue ingestion job {job_id}: {e}")
+        else:
+            if job["status"] == "running":
+                _discard_partial_document(job_id)
+            _fail_job(job_id, file_path, "Interrupted: the server restarted during ingestion")
+
+
+async def get_job(job_id: str, user_id: str):
+    """Get a job's status (verify ownership)."""
+    job = await async_jobs_collection.find_one({
+        "_id": ObjectId(job_id),
+        "user_id": user_id
+    })
+
+    if not job:
+        return None
+
+    return {
+        "id": str(job["_id"]),
+        "title": job["title"],
+        "status": job["status"],
+        "pages_total": job["pages_total"],
+        "pages_done": job["pages_done"],
+        "chunks_total": job["chunks_total"],
+        "chunks_embedded": job["chunks_embedded"],
+        "chunks_reused": job.get("chunks_reused", 0),
+        "tokens_total": job.get("tokens_total"),
+        "duplicate": job.get("duplicate", False),
+        "chunks_per_sec": job.get("chunks_per_sec"),
+        "stage_seconds": job.get("stage_seconds"),
+        "doc_id": job["doc_id"],
+        "error": job["error"],
+        "created_at": job["created_at"],
+        "updated_at": job["updated_at"]
+    }
@@ -0,0 +1,308 @@
+import json
+import math
+import os
+import shutil
+from collections import Counter
+import numpy as np
+from app.config import Config
+from app.db.mongo import passages_collection
+from app.utils.file_lock import file_lock, lock_per_key, manifest_stamp
+from app.utils.text_utils import tokenize
+
+_indexes = {}
+# Serializes building and remapping one user's index in this process
+_user_lock = lock_per_key()
+
+_SEGMENT_ARRAYS = ("ids", "lengths", "terms", "offsets", "rows", "tfs")
+
+
+class _Segment:
+    """Immutable postings for a batch of passages, stored as flat arrays.
+
+    `terms` is sorted; the postings of terms[i] are rows[offsets[i]:offsets[i+1]]
+    (segment-local row numbers) with matching term frequencies in `tfs`.
+    Every array is a plain .npy file, so a saved segment can be memory-mapped.
+    """
+
+    def __init__(self, ids, lengths, terms, offsets, rows, tfs, name=None):
+        self.ids = ids
+        self.lengths = lengths
+        self.terms = terms
+        self.offsets = offsets
+        self.rows = rows
+        self.tfs = tfs
+        self.name = name
+
+    def __len__(self):
+        return len(self.ids)
+
+    @classmethod
+    def build(cls, ids, token_lists):
+        terms, rows, tfs = [], [], []
+        for row, tokens in enumerate(token_lists):
+            for term, tf in Counter(tokens).items():
+                terms.append(term)
+                rows.append(row)
+                tfs.append(tf)
+        lengths = np.array([len(tokens) for tokens in token_lists], dtype=np.int32)
+        return cls._from_postings(
+            np.asarray(ids, dtype="<U24"), lengths,
+            np.array(terms, dtype=str), np.array(rows, dtype=np.int32), np.array(tfs, dtype=np.int32)
+        )
+
+    @classmethod
+    def _from_postings(cls, ids, lengths, terms, rows, tfs):
+        order = np.lexsort((rows, terms))
+        terms, rows, tfs = terms[order], rows[order], tfs[order]
+        unique_terms, starts = np.unique(terms, return_index=True)
+        offsets = np.append(starts, len(terms)).astype(np.int64)
+        return cls(ids, lengths, unique_terms, offsets, rows, tfs)
+
+    @classmethod
+    def merge(cls, segments):
+        """Combine segments into one, renumbering rows."""
+        terms, rows, tfs = [], [], []
+        base = 0
+        for segment in segments:
+            terms.append(np.repeat(segment.terms, np.diff(segment.offsets)))
+            rows.append(segment.rows + base)
+            tfs.append(np.asarray(segment.tfs))
+            base += len(segment)
+        return cls._from_postings(
+            np.concatenate([s.ids for s in segments]),
+            np.concatenate([s.lengths for s in segments]),
+            np.concatenate(terms), np.concatenate(rows).astype(np.int32), np.concatenate(tfs)
+        )
+
+    def postings(self, term: str):
+        i = np.searchsorted(self.terms, term)
+        if i < len(self.terms) and self.terms[i] == term:
+            return self.rows[self.offsets[i]:self.offsets[i + 1]], self.tfs[self.offsets[i]:self.offsets[i + 1]]
+        return None
+
+    def save(self, directory: str):
+        os.makedirs(directory, exist_ok=True)
+        for field in _SEGMENT_ARRAYS:
+            np.save(os.path.join(directory, f"{field}.npy"), getattr(self, field))
+
+    @classmethod
+    def load(cls, directory: str, name: str):
+        arrays = [
+            np.load(os.path.join(directory, f"{field}.npy"), mmap_mode="r")
+            for field in _SEGMENT_ARRAYS
+        ]
+        return cls(*arrays, name=name)
+
+
+class BM25Index:
+    """Per-user inverted index with BM25 scoring over passage text.
+
+    New passages are appended as small segments; once there are more than
+    BM25_MAX_SEGMENTS they are merged, LSM-style.
+    """
+
+    def __init__(self):
+        self.segments = []
+        self._next_segment = 0
+
+    def __len__(self):
+        return sum(len(s) for s in self.segments)
+
+    def add(self, ids, texts):
+        segment = _Segment.build([str(i) for i in ids], [tokenize(t) for t in texts])
+        self.segments.append(segment)
+        if len(self.segments) > Config.BM25_MAX_SEGMENTS:
+            # Fold the recent small segments together; rewrite everything only
+            # once they outgrow the oldest one, so merge cost stays amortized
+            head, tail = self.segments[0], self.segments[1:]
+            if sum(len(s) for s in tail) < len(head):
+                self.segments = [head, _Segment.merge(tail)]
+            else:
+                self.segments = [_Segment.merge(self.segments)]
+
+    def search(self, query: str, top_k: int):
+        """Return (ids, scores) of the top_k passages by BM25."""
+        terms = set(tokenize(query))
+        total = len(self)
+        if not terms or not total:
+            return [], []
+        avgdl = sum(int(s.lengths.sum()) for s in self.segments) / total
+        k1, b = Config.BM25_K1, Config.BM25_B
+
+        hits = {term: [] for term in terms}
+        for seg_num, segment in enumerate(self.segments):
+            for term in terms:
+                found = segment.postings(term)
+                if found is not None:
+                    hits[term].append((seg_num, found))
+
+        candidate_ids, candidate_scores = [], []
+        per_segment = [([], []) for _ in self.segments]
+        for term, postings in hits.items():
+            df = sum(len(rows) for _, (rows, _) in postings)
+            if not df:
+                continue
+            idf = math.log(1 + (total - df + 0.5) / (df + 0.5))
+            for seg_num, (rows, tfs) in postings:
+                tfs = np.asarray(tfs, dtype=np.float32)
+                dl = self.segments[seg_num].lengths[rows]
+                contribution = idf * tfs * (k1 + 1) / (tfs + k1 * (1 - b + b * dl / avgdl))
+                per_segment[seg_num][0].append(rows)
+                per_segment[seg_num][1].append(contribution)
+
+        for segment, (rows, contributions) in zip(self.segments, per_segment):
+            if not rows:
+                continue
+            unique_rows, inverse = np.unique(np.concatenate(rows), return_inverse=True)
+            candidate_ids.append(segment.ids[unique_rows])
+            candidate_scores.append(np.bincount(inverse, weights=np.concatenate(contributions)))
+
+        if not candidate_ids:
+            return [], []
+        ids = np.concatenate(candidate_ids)
+        scores = np.concatenate(candidate_scores)
+        if top_k < len(scores):
+            best = np.argpartition(-scores, top_k - 1)[:top_k]
+        else:
+            best = np.arange(len(scores))
+        best = best[np.argsort(-scores[best])]
+        return ids[best].tolist(), scores[best].tolist()
+
+    def save(self, directory: str):
+        """Write new segments and the manifest; drop segments merged away."""
+        os.makedirs(directory, exist_ok=True)
+        for segment in self.segments:
+            if segment.name is None:
+                segment.name = f"seg_{self._next_segment:06d}"
+                self._next_segment += 1
+                segment.save(os.path.join(directory, segment.name))
+
+        names = [s.name for s in self.segments]
+        manifest = os.path.join(directory, "manifest.json")
+        with open(manifest + ".tmp", "w") as f:
+            json.dump({"segments": names, "next_segment": self._next_segment}, f)
+        os.replace(manifest + ".tmp", manifest)
+
+        for entry in os.listdir(directory):
+            if entry.startswith("seg_") and entry not in names:
+                shutil.rmtree(os.path.join(directory, entry), ignore_errors=True)
+
+    @classmethod
+    def load(cls, directory: str):
+        with open(os.path.join(directory, "manifest.json")) as f:
+            manifest = json.load(f)
+        index = cls()
+        index._next_segment = manifest["next_segment"]
+        index.segments = [
+            _Segment.load(os.path.join(directory, name), name)
+            for name in manifest["segments"]
+        ]
+        return index
+
+
+# On disk, one directory per user: manifest.json lists the live segments
+# (seg_NNNNNN/, one .npy per array) and the next free segment number.
+# Writers hold the directory's file lock from reading the manifest to
+# replacing it, so appends from concurrent ingestion workers all land;
+# readers remap whenever the manifest changes.
+
+def _index_dir(user_id: str) -> str:
+    return os.path.join(Config.INDEX_DIR, f"{user_id}.bm25")
+
+
+def _build_from_mongo(user_id: str) -> BM25Index:
+    ids, texts = [], []
+    for passage in passages_collection.find({"user_id": user_id}, {"text": 1}):
+        ids.append(str(passage["_id"]))
+        texts.append(passage["text"])
+
+    index = BM25Index()
+    if ids:
+        index.add(ids, texts)
+    return index
+
+
+def _has_saved_index(user_id: str) -> bool:
+    return os.path.exists(os.path.join(_index_dir(user_id), "manifest.json"))
+
+
+def _manifest_stamp(directory: str):
+    return manifest_stamp(os.path.join(directory, "manifest.json"))
+
+
+def _load_or_build(user_id: str, directory: str, validate: bool) -> BM25Index:
+    """Writer side, under the file lock: the saved index, rebuilt from Mongo if missing or stale."""
+    index = None
+    if _has_saved_index(user_id):
+        index = BM25Index.load(directory)
+        if not validate or len(index) == passages_collection.count_documents({"user_id": user_id}):
+            return index
+
+    rebuilt = _build_from_mongo(user_id)
+    # Fresh segment names, so the save drops the stale segments instead of overwriting them
+    rebuilt._next_segment = index._next_segment if index is not None else 0
+    rebuilt.save(directory)
+    return rebuilt
+
+
+def get_index(user_id: str) -> BM25Index:
+    """Return the user's index, memory-mapping it from disk or building it from Mongo.
+
+    The mapping is redone when another process has saved the index since.
+    Loaded indexes are never modified, so searches need no lock.
+    """
+    directory = _index_dir(user_id)
+    cached = _indexes.get(user_id)
+    if cached is not None and cached[1] == _manifest_stamp(directory):
+        return cached[0]
+
+    with _user_lock(user_id):
+        stamp = _manifest_stamp(directory)
+        cached = _indexes.get(user_id)
+        if cached is not None and cached[1] == stamp:
+            return cached[0]
+
+        # Loading under the file lock too: a writer can't remove merged-away segments mid-load
+        with file_lock(directory):
+            index = _load_or_build(user_id, directory, validate=cached is None)
+            stamp = _manifest_stamp(directory)
+        _indexes[user_id] = (index, stamp)
+        return index
+
+
+def add_passages(user_id: str, ids: list, texts: list):
+    """Append newly inserted passages to the user's saved index as a new segment.
+
+    Skipped until the user's index exists. The index is re-read under the
+    file lock, so segments other processes saved in the meantime are kept;
+    ids already indexed (e.g. by a rebuild from Mongo) are skipped.
+    """
+    if not _has_saved_index(user_id):
+        return
+
+    directory = _index_dir(user_id)
+    with file_lock(directory):
+        if not _has_saved_index(user_id):
+            return
+        index = BM25Index.load(directory)
+        ids = np.asarray([str(i) for i in ids], dtype="<U24")
+        if index.segments:
+            new = ~np.isin(ids, np.concatenate([s.ids for s in index.segments]))
+        else:
+            new = np.ones(len(ids), dtype=bool)
+        if new.any():
+            index.add(ids[new].tolist(), [t for t, keep in zip(texts, new) if keep])
+            index.save(directory)
+
+
+def refresh(user_id: str):
+    """Rebuild the user's saved index if its size disagrees with Mongo, e.g. after a delete."""
+    if not _has_saved_index(user_id):
+        return
+    directory = _index_dir(user_id)
+    with _user_lock(user_id), file_lock(directory):
+        _load_or_build(user_id, directory, validate=True)
+
+
+def search(user_id: str, query: str, top_k: int):
+    return get_index(user_id).search(query, top_k)
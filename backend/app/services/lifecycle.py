@@ -0,0 +1,65 @@
+import asyncio
+import logging
+import time
+from app.config import Config
+from app.services import lexical_index, vector_index
+from app.services.embeddings import embed_texts, load_model
+from app.services.executor import run_cpu
+from app.services.reranker import load_reranker, rerank_enabled
+
+logger = logging.getLogger(__name__)
+
+_state = {"ready": False, "stage": "starting", "error": None, "warmup_seconds": None}
+_task = None
+
+
+def _warm_model():
+    load_model()
+    # The first encode allocates torch buffers; pay for it here, not in a request
+    embed_texts(["warmup"])
+
+
+def _preload_indexes(user_id: str):
+    vector_index.get_index(user_id)
+    if Config.RETRIEVAL_MODE == "hybrid":
+        lexical_index.get_index(user_id)
+
+
+async def warmup():
+    """Load models and hot indexes off the request path, then mark the app ready."""
+    started = time.perf_counter()
+    try:
+        _state["stage"] = "embedding model"
+        await run_cpu(_warm_model)
+        if rerank_enabled():
+            _state["stage"] = "rerank model"
+            await run_cpu(load_reranker)
+    except Exception as e:
+        logger.error(f"Warmup failed: {str(e)}", exc_info=True)
+        _state["stage"] = "failed"
+        _state["error"] = str(e)
+        return
+
+    _state["stage"] = "indexes"
+    for user_id in Config.PRELOAD_USER_IDS:
+        try:
+            await run_cpu(_preload_indexes, user_id)
+        except Exception as e:
+            # A missing index only costs that user a slower first search
+            logger.warning(f"Could not preload indexes for {user_id}: {str(e)}")
+
+    _state.update(ready=True, stage="ready", warmup_seconds=round(time.perf_counter() - started, 2))
+    logger.info(f"Warmup finished in {_state['warmup_seconds']}s")
+
+
+def start_warmup():
+    """Schedule warmup on the running event loop without blocking startup."""
+    global _task
+    if not Config.WARMUP_ON_STARTUP:
+        _state.update(ready=True, stage="ready")
+        return
+    _task = asyncio.get_running_loop().create_task(warmup())
+
+
+def readiness() -> dict:
+    return dict(_state)
@@ -0,0 +1,137 @@
+import contextvars
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300)
+COUNT_BUCKETS = (10, 100, 1000, 10000, 100000, 1000000, 10000000)
+
+_registry = []
+_collectors = []
+
+
+def _label_text(names: tuple, values: tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{value}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    """Monotonic counter, optionally split by labels."""
+
+    def __init__(self, name: str, description: str, labels: tuple = ()):
+        self.name = name
+        self.description = description
+        self.labels = labels
+        self._values = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(labels[name] for name in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_label_text(self.labels, key)} {value}")
+        return lines
+
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus exposition format."""
+
+    def __init__(self, name: str, description: str, labels: tuple = (), buckets: tuple = LATENCY_BUCKETS):
+        self.name = name
+        self.description = description
+        self.labels = labels
+        self.buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def observe(self, value: float, **labels):
+        key = tuple(labels[name] for name in self.labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                # [count per bucket..., +Inf count, sum]
+                series = self._series[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[bisect_left(self.buckets, value)] += 1
+            series[-1] += value
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, series in sorted(self._series.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets + ("+Inf",), series[:-1]):
+                    cumulative += count
+                    labels = _label_text(self.labels, key, f'le="{bound}"')
+                    lines.append(f"{self.name}_bucket{labels} {cumulative}")
+                lines.append(f"{self.name}_sum{_label_text(self.labels, key)} {series[-1]}")
+                lines.append(f"{self.name}_count{_label_text(self.labels, key)} {cumulative}")
+        return lines
+
+
+def register_collector(collect):
+    """Add a callable returning extra exposition lines, evaluated at scrape time."""
+    _collectors.append(collect)
+
+
+def render() -> str:
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    for collect in _collectors:
+        lines.extend(collect())
+    return "\n".join(lines) + "\n"
+
+
+STAGE_SECONDS = Histogram(
+    "kb_stage_seconds", "Time spent in each stage of the search and upload pipelines",
+    labels=("pipeline", "stage")
+)
+PASSAGES_SCANNED = Histogram(
+    "kb_passages_scanned", "Passage vectors scored per query", buckets=COUNT_BUCKETS
+)
+CHUNKS_EMBEDDED = Counter("kb_chunks_embedded_total", "Chunks embedded by ingestion")
+CHUNKS_REUSED = Counter("kb_chunks_reused_total", "Chunks whose embedding came from the embedding store")
+CHUNKS_PER_UPLOAD = Histogram(
+    "kb_chunks_per_upload", "Chunks stored per ingested document", buckets=COUNT_BUCKETS
+)
+
+# Per-request stage timings for the Server-Timing header; None when not requested
+_request_timings = contextvars.ContextVar("request_timings", default=None)
+
+
+def record_stage(pipeline: str, stage: str, seconds: float):
+    STAGE_SECONDS.observe(seconds, pipeline=pipeline, stage=stage)
+    timings = _request_timings.get()
+    if timings is not None:
+        timings.append((stage, seconds))
+
+
+@contextmanager
+def timed(pipeline: str, stage: str):
+    """Time the enclosed block (sync or containing awaits) as one pipeline stage."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(pipeline, stage, time.perf_counter() - start)
+
+
+def collect_request_timings() -> list:
+    """Start collecting stage timings for the current request; returns the live list."""
+    timings = []
+    _request_timings.set(timings)
+    return timings
+
+
+def server_timing_header(timings: list) -> str:
+    return ", ".join(f"{stage};dur={seconds * 1000:.1f}" for stage, seconds in timings)
@@ -1,16 +1,38 @@
+import logging
 import ollama
 from app.config import Config
 
-client = ollama.Client(host=Config.OLLAMA_BASE_URL)
+logger = logging.getLogger(__name__)
 
-def generate_answer(prompt: str, model: str = "llama3"):
+_async_client = None
+
+def get_async_client() -> ollama.AsyncClient:
+    global _async_client
+    if _async_client is None:
+        _async_client = ollama.AsyncClient(host=Config.OLLAMA_BASE_URL)
+    return _async_client
+
+FALLBACK_ANSWER = "I am sorry, but I am unable to generate an answer at this time."
+
+async def generate_answer(prompt: str, model: str = Config.OLLAMA_MODEL):
     try:
-        response = client.generate(
+        response = await get_async_client().generate(
             model=model,
             prompt=prompt
         )
         return response['response']
     except Exception as e:
         # Handle potential connection errors or other issues with Ollama service
-        print(f"Error calling Ollama: {e}")
-        return "I am sorry, but I am unable to generate an answer at this time."
+        logger.error(f"Error calling Ollama: {e}")
+        return FALLBACK_ANSWER
+
+async def stream_answer(prompt: str, model: str = Config.OLLAMA_MODEL):
+    """Yield answer text fragments as Ollama produces them.
+
+    Raises on connection errors so the caller can tell a failed stream from
+    a finished one.
+    """
+    stream = await get_async_client().generate(model=model, prompt=prompt, stream=True)
+    async for part in stream:
+        if part['response']:
+            yield part['response']
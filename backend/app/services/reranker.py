@@ -0,0 +1,80 @@
+import asyncio
+import logging
+import time
+from app.config import Config
+from app.services.executor import run_rerank
+
+logger = logging.getLogger(__name__)
+
+_model = None
+_in_flight = 0
+_seconds_per_pair = None  # moving average of observed scoring cost
+
+
+def load_reranker():
+    global _model
+    if _model is None:
+        from sentence_transformers import CrossEncoder
+        _model = CrossEncoder(Config.RERANK_MODEL, device="cpu")
+    return _model
+
+
+def rerank_enabled() -> bool:
+    return bool(Config.RERANK_MODEL)
+
+
+def _score(query: str, passages: list) -> list:
+    """Cross-encoder relevance of every passage, in one batched forward pass."""
+    model = load_reranker()
+    scores = model.predict(
+        [(query, p['text']) for p in passages],
+        batch_size=len(passages),
+        show_progress_bar=False
+    )
+    return [float(s) for s in scores]
+
+
+def _record(future, pairs: int, started: float):
+    """Runs when scoring actually finishes, which may be after the caller gave up."""
+    global _in_flight, _seconds_per_pair
+    _in_flight -= 1
+    if future.cancelled() or future.exception() is not None:
+        return
+    per_pair = (time.perf_counter() - started) / pairs
+    _seconds_per_pair = per_pair if _seconds_per_pair is None else 0.8 * _seconds_per_pair + 0.2 * per_pair
+
+
+async def rerank(query: str, passages: list, top_n: int) -> list:
+    """Reorder passages by cross-encoder score and keep the best top_n.
+
+    The RERANK_TIMEOUT_MS budget is enforced before any work starts: the
+    candidate pool is cut to what the observed per-pair cost fits in the
+    budget, and when all RERANK_WORKERS are busy the rerank is skipped.
+    Scoring that still overruns is abandoned; in every fallback case the
+    passages are returned in their original (cosine) order.
+    """
+    global _in_flight
+    if not passages:
+        return passages
+    if _in_flight >= Config.RERANK_WORKERS:
+        logger.warning("Rerank pool busy; using cosine order")
+        return passages[:top_n]
+
+    budget = Config.RERANK_TIMEOUT_MS / 1000
+    if _seconds_per_pair:
+        # Candidates arrive best-first, so trimming keeps the most promising ones
+        passages = passages[:max(top_n, int(budget / _seconds_per_pair))]
+
+    started = time.perf_counter()
+    _in_flight += 1
+    scoring = asyncio.ensure_future(run_rerank(_score, query, passages))
+    scoring.add_done_callback(lambda f: _record(f, len(passages), started))
+    try:
+        scores = await asyncio.wait_for(asyncio.shield(scoring), timeout=budget)
+    except asyncio.TimeoutError:
+        logger.warning(f"Rerank of {len(passages)} passages exceeded {Config.RERANK_TIMEOUT_MS} ms; using cosine order")
+        return passages[:top_n]
+
+    logger.debug(f"Reranked {len(passages)} passages in {(time.perf_counter() - started) * 1000:.0f} ms")
+    ranked = sorted(zip(scores, range(len(passages))), reverse=True)[:top_n]
+    return [{**passages[i], 'rerank_score': score} for score, i in ranked]
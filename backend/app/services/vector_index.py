@@ -0,0 +1,553 @@
+import copy
+import json
+import os
+import threading
+import numpy as np
+from app.config import Config
+from app.db.mongo import passages_collection
+from app.services.metrics import PASSAGES_SCANNED
+from app.utils.file_lock import file_lock, lock_per_key, manifest_stamp
+from app.utils.vector_codec import decode_embedding
+
+_indexes = {}
+# Serializes building and remapping one user's index in this process
+_user_lock = lock_per_key()
+
+# Passage ids are ObjectId hex strings; bytes keep the mapped id file small
+_ID_DTYPE = "S24"
+
+
+def _normalize(vectors):
+    """Return row-normalized float32 copies of the given vectors."""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if vectors.ndim == 1:
+        vectors = vectors.reshape(1, -1)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def _id_array(ids):
+    if isinstance(ids, np.ndarray) and ids.dtype == _ID_DTYPE:
+        return ids
+    return np.asarray([str(i) for i in ids], dtype=_ID_DTYPE)
+
+
+def _id_list(ids):
+    return ids.astype("U24").tolist()
+
+
+def _top_k(scores, k):
+    """Indices of the k highest scores, best first."""
+    if k >= len(scores):
+        return np.argsort(-scores)
+    part = np.argpartition(-scores, k - 1)[:k]
+    return part[np.argsort(-scores[part])]
+
+
+def _top_k_rows(scores, k):
+    """Row-wise indices of the k highest scores in a 2-D score matrix."""
+    if k >= scores.shape[1]:
+        return np.argsort(-scores, axis=1)
+    part = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    order = np.argsort(-np.take_along_axis(scores, part, axis=1), axis=1)
+    return np.take_along_axis(part, order, axis=1)
+
+
+class ExactIndex:
+    """Exhaustive index over one contiguous, pre-normalized float32 matrix.
+
+    A batch of queries is scored with a single matrix product and the top_k
+    rows are selected with argpartition. The matrix is either built in
+    memory with `add` or attached read-only from the shared index files.
+    """
+
+    def __init__(self, dim: int = 0):
+        self.ids = np.empty(0, dtype=_ID_DTYPE)
+        self.vectors = np.empty((0, dim), dtype=np.float32)
+        self._id_buffer = self.ids
+        self._vector_buffer = self.vectors
+        self._id_order = None
+        # Guards the lazily built lookup structures; scoring itself only reads
+        self._lazy_lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.ids)
+
+    def add(self, ids, vectors):
+        """Append passages to the matrix.
+
+        Rows live in an over-allocated buffer that doubles when full, so a
+        stream of small appends costs amortized O(1) copies per row.
+        """
+        vectors = _normalize(vectors)
+        n, end = len(self.ids), len(self.ids) + len(vectors)
+        if len(self.ids) == 0 and self.vectors.shape[1] != vectors.shape[1]:
+            self.vectors = np.empty((0, vectors.shape[1]), dtype=np.float32)
+
+        if end > len(self._vector_buffer):
+            capacity = max(end, 2 * len(self._vector_buffer))
+            vector_buffer = np.empty((capacity, vectors.shape[1]), dtype=np.float32)
+            vector_buffer[:n] = self.vectors
+            id_buffer = np.empty(capacity, dtype=_ID_DTYPE)
+            id_buffer[:n] = self.ids
+            self._vector_buffer, self._id_buffer = vector_buffer, id_buffer
+
+        self._vector_buffer[n:end] = vectors
+        self._id_buffer[n:end] = _id_array(ids)
+        self.vectors = self._vector_buffer[:end]
+        self.ids = self._id_buffer[:end]
+        self._id_order = None
+
+    def _attach(self, ids, vectors):
+        """Point the index at (memory-mapped) arrays.
+
+        When the new arrays extend the current ones, as after an append,
+        the sorted id order is kept and only the new rows get merged in.
+        """
+        if len(ids) < len(self.ids):
+            self._id_order = None
+        self.ids = self._id_buffer = ids
+        self.vectors = self._vector_buffer = vectors
+
+    def _sorted_order(self):
+        n = len(self)
+        with self._lazy_lock:
+            if self._id_order is None:
+                self._id_order = np.argsort(self.ids)
+            elif len(self._id_order) < n:
+                done = len(self._id_order)
+                tail = done + np.argsort(self.ids[done:n])
+                positions = np.searchsorted(self.ids[self._id_order], self.ids[tail])
+                self._id_order = np.insert(self._id_order, positions, tail)
+            return self._id_order
+
+    def rows_for(self, ids):
+        """Row numbers of the given passage ids; -1 for ids not in the index."""
+        ids = _id_array(ids)
+        if len(self) == 0:
+            return np.full(len(ids), -1)
+        order = self._sorted_order()
+        positions = np.searchsorted(self.ids, ids, sorter=order)
+        rows = order[np.minimum(positions, len(self) - 1)]
+        rows[self.ids[rows] != ids] = -1
+        return rows
+
+    def search_rows(self, query_vector, rows, top_k: int):
+        """Exact top_k among the given rows only."""
+        query = _normalize(query_vector)[0]
+        rows = np.asarray(rows)
+        PASSAGES_SCANNED.observe(len(rows))
+        scores = self.vectors[rows] @ query
+        best = _top_k(scores, top_k)
+        return _id_list(self.ids[rows[best]]), scores[best].tolist()
+
+    def search_batch(self, query_vectors, top_k: int):
+        """Return one (ids, scores) pair per query."""
+        queries = _normalize(query_vectors)
+        if len(self) == 0:
+            return [([], []) for _ in queries]
+        for _ in queries:
+            PASSAGES_SCANNED.observe(len(self))
+        scores = queries @ self.vectors.T
+        best = _top_k_rows(scores, top_k)
+        best_scores = np.take_along_axis(scores, best, axis=1)
+        return [
+            (_id_list(self.ids[rows]), row_scores.tolist())
+            for rows, row_scores in zip(best, best_scores)
+        ]
+
+    def search(self, query_vector, top_k: int):
+        """Return (ids, scores) of the top_k passages for a single query."""
+        return self.search_batch(query_vector, top_k)[0]
+
+
+
+class IVFIndex(ExactIndex):
+    """Inverted-file ANN index over normalized passage embeddings.
+
+    Vectors are bucketed under spherical k-means centroids; a query only
+    scores the buckets of its `nprobe` nearest centroids. Small indexes are
+    searched exhaustively until they reach `min_train` rows.
+    """
+
+    def __init__(self, dim: int = 0):
+        super().__init__(dim)
+        self.centroids = None
+        self.assign = np.empty(0, dtype=np.int32)
+        self._trained_size = 0
+        self._order = None
+        self._offsets = None
+
+    def add(self, ids, vectors):
+        """Append passages and assign them to their nearest bucket."""
+        start = len(self)
+        super().add(ids, vectors)
+
+        if self.centroids is not None:
+            self.assign = np.concatenate([self.assign, self._assign(self.vectors[start:])])
+        # Retrain once the index has doubled since the last training
+        if len(self) >= Config.IVF_MIN_TRAIN and len(self) >= 2 * self._trained_size:
+            self.train()
+
+    def train(self, iterations: int = 10):
+        """Fit spherical k-means centroids on a sample and re-bucket every row."""
+        n = len(self)
+        nlist = max(1, int(np.sqrt(n)))
+        rng = np.random.default_rng(0)
+        sample_size = min(n, nlist * 64)
+        sample = self.vectors[rng.choice(n, sample_size, replace=False)]
+        centroids = sample[rng.choice(sample_size, nlist, replace=False)].copy()
+
+        for _ in range(iterations):
+            labels = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, labels, sample)
+            empty = np.bincount(labels, minlength=nlist) == 0
+            sums[empty] = centroids[empty]
+            centroids = _normalize(sums)
+
+        self.centroids = centroids
+        self.assign = self._assign(self.vectors)
+        self._trained_size = n
+        self._order = self._offsets = None
+
+    def _assign(self, vectors, block: int = 65536):
+        labels = np.empty(len(vectors), dtype=np.int32)
+        for start in range(0, len(vectors), block):
+            chunk = vectors[start:start + block]
+            labels[start:start + block] = np.argmax(chunk @ self.centroids.T, axis=1)
+        return labels
+
+    def _attach_buckets(self, centroids, assign, retrained: bool):
+        """Point the index at (memory-mapped) centroids and assignments."""
+        if retrained:
+            self._order = self._offsets = None
+        self.centroids = centroids
+        self.assign = assign
+
+    def _buckets(self):
+        n = len(self.assign)
+        with self._lazy_lock:
+            if self._order is None:
+                self._order = np.argsort(self.assign, kind="stable")
+            elif len(self._order) < n:
+                # Appended rows go to the end of their buckets; no full re-sort
+                done = len(self._order)
+                tail = done + np.argsort(self.assign[done:n], kind="stable")
+                self._order = np.insert(self._order, self._offsets[self.assign[tail] + 1], tail)
+            if self._offsets is None or self._offsets[-1] != n:
+                counts = np.bincount(self.assign, minlength=len(self.centroids))
+                self._offsets = np.concatenate([[0], np.cumsum(counts)])
+            return self._order, self._offsets
+
+    def search_batch(self, query_vectors, top_k: int):
+        """Return one (ids, scores) pair per query, probing nearby buckets only."""
+        if self.centroids is None:
+            return super().search_batch(query_vectors, top_k)
+
+        queries = _normalize(query_vectors)
+        order, offsets = self._buckets()
+        nprobe = min(Config.IVF_NPROBE, len(self.centroids))
+        probes = _top_k_rows(queries @ self.centroids.T, nprobe)
+
+        results = []
+        for query, probe in zip(queries, probes):
+            rows = np.concatenate([order[offsets[c]:offsets[c + 1]] for c in probe])
+            if len(rows) < top_k:
+                rows = np.arange(len(self))
+            PASSAGES_SCANNED.observe(len(rows))
+            scores = self.vectors[rows] @ query
+            best = _top_k(scores, top_k)
+            results.append((_id_list(self.ids[rows[best]]), scores[best].tolist()))
+        return results
+
+
+# Shared on-disk layout, one directory per user:
+#   manifest.json       version, generation, committed row count, dim, IVF files
+#   g{gen}.ids/.vectors append-only raw rows, memory-mapped read-only by every process
+#   g{gen}.c{v}.npy     IVF centroids, g{gen}.a{v}.assign bucket of every row
+# One process at a time writes, under an exclusive file lock; readers map a
+# new manifest under the same lock, so its files can't be removed mid-map.
+# Rows past the manifest's count are uncommitted and ignored by readers.
+
+def _index_dir(user_id: str) -> str:
+    return os.path.join(Config.INDEX_DIR, f"{user_id}.vec")
+
+
+def _index_class():
+    if Config.SEARCH_BACKEND == "exact":
+        return ExactIndex
+    return IVFIndex
+
+
+def _manifest_path(directory: str) -> str:
+    return os.path.join(directory, "manifest.json")
+
+
+def _read_manifest(directory: str):
+    try:
+        with open(_manifest_path(directory)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def _write_manifest(directory: str, manifest: dict):
+    path = _manifest_path(directory)
+    with open(path + ".tmp", "w") as f:
+        json.dump(manifest, f)
+    os.replace(path + ".tmp", path)
+
+
+def _write_rows(path: str, start_row: int, rows: np.ndarray):
+    """Write rows at their slot, overwriting any uncommitted tail of a failed writer."""
+    mode = "r+b" if os.path.exists(path) else "w+b"
+    with open(path, mode) as f:
+        f.seek(start_row * rows[0:1].nbytes)
+        f.write(rows.tobytes())
+        f.truncate()
+
+
+def _map(path: str, dtype, shape):
+    if shape[0] == 0:
+        return np.empty(shape, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode="r", shape=shape)
+
+
+def _attach(directory: str, manifest: dict, index: ExactIndex = None) -> ExactIndex:
+    """Map the committed rows of a manifest into a copy of `index` (or a new one).
+
+    Mapping is O(1): pages are read on demand and shared between processes
+    through the OS page cache. The copy keeps the sorted id order and
+    buckets built so far, while threads still scoring the old view never
+    see its arrays change.
+    """
+    prefix = os.path.join(directory, f"g{manifest['generation']}")
+    n, dim = manifest["count"], manifest["dim"]
+    if index is None:
+        index = _index_class()()
+    else:
+        index = copy.copy(index)
+        index._lazy_lock = threading.Lock()
+    index._attach(
+        _map(prefix + ".ids", _ID_DTYPE, (n,)),
+        _map(prefix + ".vectors", np.float32, (n, dim))
+    )
+    if isinstance(index, IVFIndex) and manifest.get("centroids"):
+        retrained = getattr(index, "_centroids_file", None) != manifest["centroids"]
+        centroids = np.load(os.path.join(directory, manifest["centroids"])) if retrained else index.centroids
+        index._attach_buckets(
+            centroids, _map(os.path.join(directory, manifest["assign"]), np.int32, (n,)), retrained
+        )
+        index._centroids_file = manifest["centroids"]
+        index._trained_size = manifest["trained_size"]
+    return index
+
+
+def _remove_files(directory: str, keep: set):
+    for name in os.listdir(directory):
+        if name.startswith("g") and name not in keep:
+            try:
+                os.remove(os.path.join(directory, name))
+            except OSError:
+                pass  # still mapped on Windows; removed by a later write
+
+
+def _current_files(manifest: dict) -> set:
+    prefix = f"g{manifest['generation']}"
+    return {prefix + ".ids", prefix + ".vectors", manifest.get("centroids"), manifest.get("assign")}
+
+
+def _maybe_train(directory: str, manifest: dict) -> bool:
+    """Writer side: (re)train IVF once the index has doubled since the last training."""
+    n = manifest["count"]
+    if _index_class() is not IVFIndex or n < Config.IVF_MIN_TRAIN or n < 2 * manifest["trained_size"]:
+        return False
+    index = _attach(directory, {**manifest, "centroids": None}, IVFIndex())
+    index.train()
+    prefix = f"g{manifest['generation']}"
+    version = manifest["version"] + 1
+    centroids_file, assign_file = f"{prefix}.c{version}.npy", f"{prefix}.a{version}.assign"
+    np.save(os.path.join(directory, centroids_file), index.centroids)
+    _write_rows(os.path.join(directory, assign_file), 0, index.assign.astype(np.int32))
+    manifest.update(centroids=centroids_file, assign=assign_file, trained_size=n)
+    return True
+
+
+def _commit(directory: str, manifest: dict):
+    manifest["version"] += 1
+    _write_manifest(directory, manifest)
+    _remove_files(directory, _current_files(manifest))
+
+
+def _append(directory: str, manifest: dict, ids: np.ndarray, vectors: np.ndarray):
+    """Writer side: write rows (and their IVF buckets) past the committed count, then commit."""
+    n = manifest["count"]
+    prefix = os.path.join(directory, f"g{manifest['generation']}")
+    _write_rows(prefix + ".ids", n, ids)
+    _write_rows(prefix + ".vectors", n, vectors)
+    if manifest.get("centroids"):
+        centroids = np.load(os.path.join(directory, manifest["centroids"]))
+        labels = np.argmax(vectors @ centroids.T, axis=1).astype(np.int32)
+        _write_rows(os.path.join(directory, manifest["assign"]), n, labels)
+    manifest.update(count=n + len(ids), dim=vectors.shape[1])
+    _maybe_train(directory, manifest)
+    _commit(directory, manifest)
+
+
+def _rebuild(user_id: str, directory: str, manifest) -> dict:
+    """Writer side: write a new generation from the embeddings stored in Mongo."""
+    new = {
+        "version": manifest["version"] if manifest else 0,
+        "generation": manifest["generation"] + 1 if manifest else 0,
+        "count": 0, "dim": 0, "centroids": None, "assign": None, "trained_size": 0
+    }
+    prefix = os.path.join(directory, f"g{new['generation']}")
+    projection = {"embedding": 1, "embedding_format": 1, "embedding_scale": 1}
+
+    batch = []
+    cursor = passages_collection.find({"user_id": user_id}, projection)
+    for passage in cursor:
+        batch.append(passage)
+        if len(batch) == 4096:
+            new = _write_batch(prefix, new, batch)
+            batch = []
+    if batch:
+        new = _write_batch(prefix, new, batch)
+
+    _maybe_train(directory, new)
+    _commit(directory, new)
+    return new
+
+
+def _write_batch(prefix: str, manifest: dict, passages: list) -> dict:
+    ids = _id_array(p["_id"] for p in passages)
+    vectors = _normalize(np.stack([decode_embedding(p) for p in passages]))
+    _write_rows(prefix + ".ids", manifest["count"], ids)
+    _write_rows(prefix + ".vectors", manifest["count"], vectors)
+    return {**manifest, "count": manifest["count"] + len(ids), "dim": vectors.shape[1]}
+
+
+def _validated_manifest(user_id: str, directory: str) -> dict:
+    """The user's manifest, rebuilt from Mongo if its row count disagrees. Needs the file lock."""
+    manifest = _read_manifest(directory)
+    if manifest is not None and manifest["count"] == passages_collection.count_documents({"user_id": user_id}):
+        return manifest
+    return _rebuild(user_id, directory, manifest)
+
+
+def _load(user_id: str, validate: bool) -> ExactIndex:
+    """Return the process's view of the user's index, remapping it if a writer committed since.
+
+    Call with the user's lock and the directory's file lock held: a writer
+    removes superseded files right after committing, so a manifest is only
+    safe to map while no writer can commit.
+    """
+    directory = _index_dir(user_id)
+    stamp = manifest_stamp(_manifest_path(directory))
+    cached = _indexes.get(user_id)
+    if cached is not None and cached[1] == stamp:
+        return cached[0]
+
+    if cached is None and validate:
+        manifest = _validated_manifest(user_id, directory)
+        stamp = manifest_stamp(_manifest_path(directory))
+    else:
+        manifest = _read_manifest(directory)
+        if manifest is None:
+            manifest = _validated_manifest(user_id, directory)
+            stamp = manifest_stamp(_manifest_path(directory))
+
+    # Same generation: the files only grew, so the new view carries on from the old one
+    reuse = cached[0] if cached is not None and cached[2] == manifest["generation"] else None
+    index = _attach(directory, manifest, reuse)
+    _indexes[user_id] = (index, stamp, manifest["generation"])
+    return index
+
+
+def get_index(user_id: str) -> ExactIndex:
+    """Return the user's index, mapping the shared files or building them from Mongo.
+
+    Only a (re)map takes the user's lock and the file lock; a cold build
+    for one user never blocks searches of another.
+    """
+    cached = _indexes.get(user_id)
+    if cached is not None and cached[1] == manifest_stamp(_manifest_path(_index_dir(user_id))):
+        return cached[0]
+    with _user_lock(user_id), file_lock(_index_dir(user_id)):
+        return _load(user_id, validate=True)
+
+
+def add_passages(user_id: str, ids: list, vectors):
+    """Append newly inserted passages to the user's shared index files.
+
+    Users whose index has never been built are skipped; their index is built
+    from Mongo on their first search. Ids already in the index are ignored,
+    so a concurrent rebuild cannot duplicate rows.
+    """
+    directory = _index_dir(user_id)
+    with _user_lock(user_id):
+        if _read_manifest(directory) is None:
+            return
+        with file_lock(directory):
+            index = _load(user_id, validate=False)
+            ids = _id_array(ids)
+            new = index.rows_for(ids) < 0
+            if new.any():
+                _append(directory, _read_manifest(directory), ids[new], _normalize(vectors)[new])
+
+
+def refresh(user_id: str):
+    """Rebuild the user's shared index if its row count disagrees with Mongo, e.g. after a delete.
+
+    Indexes never built are left alone; readers remap on their next search.
+    """
+    directory = _index_dir(user_id)
+    if _read_manifest(directory) is None:
+        return
+    with _user_lock(user_id), file_lock(directory):
+        _validated_manifest(user_id, directory)
+
+
+def search(user_id: str, query_vector, top_k: int):
+    """Return (ids, scores) of the user's top_k passages for the query."""
+    return search_batch(user_id, [query_vector], top_k)[0]
+
+
+def search_within(user_id: str, query_vector, ids: list, top_k: int):
+    """Dense top_k restricted to a candidate set of passage ids."""
+    index = get_index(user_id)
+    rows = index.rows_for(ids)
+    rows = rows[rows >= 0]
+    if len(rows) == 0:
+        return [], []
+    return index.search_rows(query_vector, rows, top_k)
+
+
+def score_ids(user_id: str, query_vector, ids: list):
+    """Cosine scores of specific passages; None for ids missing from the index."""
+    index = get_index(user_id)
+    rows = index.rows_for(ids)
+    query = _normalize(query_vector)[0]
+    scores = index.vectors[np.maximum(rows, 0)] @ query if len(index) else np.zeros(len(rows))
+    return [float(s) if r >= 0 else None for r, s in zip(rows, scores)]
+
+
+def vectors_for(user_id: str, ids: list) -> np.ndarray:
+    """Normalized stored vectors of specific passages; zero rows for ids missing from the index."""
+    index = get_index(user_id)
+    rows = index.rows_for(ids)
+    if len(index) == 0:
+        return np.zeros((len(rows), index.vectors.shape[1]), dtype=np.float32)
+    vectors = index.vectors[np.maximum(rows, 0)]
+    vectors[rows < 0] = 0
+    return vectors
+
+
+def search_batch(user_id: str, query_vectors, top_k: int):
+    """Return one (ids, scores) pair per query vector.
+
+    Scoring only reads the mapped arrays, so it runs without a lock.
+    """
+    return get_index(user_id).search_batch(query_vectors, top_k)
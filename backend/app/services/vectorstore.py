@@ -1,30 +1,103 @@
-from app.db.mongo import documents_collection, passages_collection
-from app.services.embeddings import embed_text
+from app.config import Config
+from app.db.mongo import (
+    documents_collection, passages_collection, async_documents_collection, async_passages_collection
+)
+from app.services.embeddings import embed_query_async
+from app.services import lexical_index, vector_index
+from app.services.executor import run_cpu
+from app.services.metrics import PASSAGES_SCANNED, timed
+from app.services.answer_cache import invalidate_user_answers
+from app.utils.text_utils import text_hash
+from app.utils.vector_codec import EMBEDDING_FIELDS, decode_embedding, encode_embedding
 from bson.objectid import ObjectId
 import numpy as np
 
-def create_document_and_passages(title: str, passages_data: list, user_id: str):
-    doc_id = documents_collection.insert_one({
+_DEDUP_OVERFETCH = 2
+
+def create_document(title: str, user_id: str) -> str:
+    invalidate_user_answers(user_id)
+    return str(documents_collection.insert_one({
         "title": title,
         "user_id": user_id
-    }).inserted_id
+    }).inserted_id)
+
+def mark_document_complete(doc_id: str, file_hash: str, chunk_count: int, token_count: int):
+    """Record chunking stats and the source file's hash once all passages are stored."""
+    documents_collection.update_one({"_id": ObjectId(doc_id)}, {"$set": {
+        "file_hash": file_hash,
+        "chunk_count": chunk_count,
+        "token_count": token_count
+    }})
+
+def discard_document(doc_id: str, user_id: str):
+    """Delete a partially ingested document and its passages, and drop them from the indexes."""
+    passages_collection.delete_many({"user_id": user_id, "doc_id": doc_id})
+    documents_collection.delete_one({"_id": ObjectId(doc_id), "user_id": user_id})
+    invalidate_user_answers(user_id)
+    vector_index.refresh(user_id)
+    lexical_index.refresh(user_id)
+
+async def find_document_by_hash(user_id: str, file_hash: str):
+    """Id of the user's fully ingested document with this file hash, if any."""
+    document = await async_documents_collection.find_one(
+        {"user_id": user_id, "file_hash": file_hash}, {"_id": 1}
+    )
+    return str(document["_id"]) if document else None
+
+async def list_documents(user_id: str, limit: int, after: str = None):
+    """Yield the user's documents in upload order, starting after document id `after`."""
+    query = {"user_id": user_id}
+    if after:
+        query["_id"] = {"$gt": ObjectId(after)}
+    async for doc in async_documents_collection.find(query, {"title": 1}).sort("_id", 1).limit(limit):
+        yield {"id": str(doc["_id"]), "title": doc["title"]}
+
+def unique_passages(passages, seen: set):
+    """Tag passages with their text hash, skipping text already in `seen`."""
+    for passage in passages:
+        passage['text_hash'] = text_hash(passage['text'])
+        if passage['text_hash'] in seen:
+            continue
+        seen.add(passage['text_hash'])
+        yield passage
+
+def known_text_hashes(user_id: str, hashes: list) -> set:
+    """The subset of chunk hashes already stored as passages for this user."""
+    found = passages_collection.find(
+        {"user_id": user_id, "text_hash": {"$in": list(set(hashes))}}, {"text_hash": 1}
+    )
+    return {p["text_hash"] for p in found}
 
+def insert_passage_batch(doc_id: str, title: str, user_id: str, batch: list, embeddings: np.ndarray):
+    """Insert one embedded batch of passages and add it to the user's index."""
     passages_to_insert = []
-    for passage in passages_data:
-        embedding = embed_text(passage['text'])
+    for passage, embedding in zip(batch, embeddings):
         passages_to_insert.append({
-            "doc_id": str(doc_id),
+            "doc_id": doc_id,
             "doc_title": title,
             "page": passage['page'],
+            "page_end": passage.get('page_end', passage['page']),
+            "tokens": passage.get('tokens'),
             "text": passage['text'],
-            "embedding": embedding,
+            "text_hash": passage['text_hash'],
+            **encode_embedding(embedding, Config.EMBEDDING_STORAGE),
             "user_id": user_id
         })
-    
-    if passages_to_insert:
-        passages_collection.insert_many(passages_to_insert)
-    
-    return str(doc_id)
+    result = passages_collection.insert_many(passages_to_insert)
+    vector_index.add_passages(user_id, result.inserted_ids, embeddings)
+    lexical_index.add_passages(user_id, result.inserted_ids, [p['text'] for p in batch])
+    return result.inserted_ids
+
+def batched(items, size: int):
+    """Yield lists of up to `size` items from any iterable."""
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
 
 def cosine_similarity(vec1, vec2):
     """Calculate cosine similarity between two vectors."""
@@ -37,25 +110,98 @@ def cosine_similarity(vec1, vec2):
         return 0
     return dot_product / (norm1 * norm2)
 
-def vector_search(query: str, user_id: str, top_k: int = 8):
-    query_embedding = embed_text(query)
-    
-    # Fetch passages only for this user
+def _legacy_vector_search(query_embedding, user_id: str, top_k: int):
+    """Original full-scan path, kept selectable for comparison."""
     all_passages = list(passages_collection.find(
         {"user_id": user_id},
-        {"_id": 0}
+        {"doc_id": 1, "doc_title": 1, "page": 1, "text": 1, **{f: 1 for f in EMBEDDING_FIELDS}}
     ))
     
-    if not all_passages:
-        return []
-    
-    # Calculate similarity scores for each passage
+    PASSAGES_SCANNED.observe(len(all_passages))
     scored_passages = []
     for passage in all_passages:
-        score = cosine_similarity(query_embedding, passage['embedding'])
-        passage['score'] = score
+        passage['id'] = str(passage.pop('_id'))
+        # float32 vectors give an np.float32, which BSON (answer cache) cannot encode
+        passage['score'] = float(cosine_similarity(query_embedding, decode_embedding(passage)))
+        for field in EMBEDDING_FIELDS:
+            passage.pop(field, None)
         scored_passages.append(passage)
     
-    # Sort by score and return top_k
     scored_passages.sort(key=lambda x: x['score'], reverse=True)
     return scored_passages[:top_k]
+
+async def _fetch_passages(user_id: str, ids: list, scores: list, top_k: int):
+    """Load the winning passages from Mongo in score order, dropping repeated text."""
+    if not ids:
+        return []
+    
+    by_id = {}
+    async for p in async_passages_collection.find(
+        {"_id": {"$in": [ObjectId(i) for i in ids]}, "user_id": user_id},
+        {field: 0 for field in EMBEDDING_FIELDS}
+    ):
+        by_id[str(p.pop('_id'))] = p
+    
+    results = []
+    seen = set()
+    for passage_id, score in zip(ids, scores):
+        passage = by_id.get(passage_id)
+        if passage is None:
+            continue
+        # Passages stored before text hashes existed are hashed on the fly
+        digest = passage.pop('text_hash', None) or text_hash(passage['text'])
+        if digest in seen:
+            continue
+        seen.add(digest)
+        passage['id'] = passage_id
+        passage['score'] = score
+        results.append(passage)
+        if len(results) == top_k:
+            break
+    return results
+
+def _hybrid_search(user_id: str, query: str, query_embedding, top_k: int):
+    """BM25 + dense retrieval fused with reciprocal rank fusion.
+
+    With HYBRID_PREFILTER the dense ranking is computed only over the lexical
+    candidates, unless there are too few of them to fill top_k. Returned
+    scores are the dense cosine similarities of the fused winners.
+    """
+    pool = max(Config.HYBRID_CANDIDATES, top_k)
+    lexical_ids, _ = lexical_index.search(user_id, query, pool)
+    if Config.HYBRID_PREFILTER and len(lexical_ids) >= top_k:
+        dense_ids, _ = vector_index.search_within(user_id, query_embedding, lexical_ids, pool)
+    else:
+        dense_ids, _ = vector_index.search(user_id, query_embedding, pool)
+
+    fused = {}
+    for ranking in (lexical_ids, dense_ids):
+        for rank, passage_id in enumerate(ranking):
+            fused[passage_id] = fused.get(passage_id, 0.0) + 1.0 / (Config.RRF_K + rank + 1)
+    ids = sorted(fused, key=fused.get, reverse=True)[:top_k]
+    scores = vector_index.score_ids(user_id, query_embedding, ids)
+    return ids, [s if s is not None else 0.0 for s in scores]
+
+async def vector_search(query: str, user_id: str, top_k: int = 8):
+    with timed("search", "embed"):
+        query_embedding = await embed_query_async(query)
+
+    if Config.SEARCH_BACKEND == "legacy":
+        with timed("search", "score"):
+            return await run_cpu(_legacy_vector_search, query_embedding, user_id, top_k)
+
+    # Score against the user's indexes, then fetch only the winners.
+    # Over-fetch so duplicate passages can be dropped, and widen the pool
+    # until top_k distinct texts are found or the index runs out.
+    candidates = top_k * _DEDUP_OVERFETCH
+    while True:
+        with timed("search", "score"):
+            if Config.RETRIEVAL_MODE == "hybrid":
+                ids, scores = await run_cpu(_hybrid_search, user_id, query, query_embedding, candidates)
+            else:
+                ids, scores = await run_cpu(vector_index.search, user_id, query_embedding, candidates)
+        with timed("search", "fetch"):
+            results = await _fetch_passages(user_id, ids, scores, top_k)
+        if len(results) == top_k or len(ids) < candidates:
+            return results
+        candidates *= 2
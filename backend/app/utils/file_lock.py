@@ -0,0 +1,49 @@
+import os
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+@contextmanager
+def file_lock(directory: str):
+    """Exclusive cross-process lock on a directory, held through a `.lock` file in it."""
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, ".lock"), "a+b") as f:
+        if fcntl:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def manifest_stamp(path: str):
+    """Cheap change check for a file updated with os.replace, which gives every version a new inode."""
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_ino, stat.st_mtime_ns
+
+
+def lock_per_key():
+    """Return get(key) -> RLock, creating one in-process lock per key (e.g. per user) on first use."""
+    locks = {}
+    guard = threading.Lock()
+
+    def get(key) -> threading.RLock:
+        with guard:
+            return locks.setdefault(key, threading.RLock())
+    return get
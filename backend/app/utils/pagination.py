@@ -0,0 +1,48 @@
+import base64
+import json
+from app.config import Config
+
+
+def page_size(limit: int = None) -> int:
+    """Requested page size, defaulted and capped at PAGE_SIZE_MAX."""
+    if not limit or limit < 1:
+        return Config.PAGE_SIZE_DEFAULT
+    return min(limit, Config.PAGE_SIZE_MAX)
+
+
+def encode_cursor(*values) -> str:
+    """Opaque cursor for the sort key of the last item on a page."""
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+
+def decode_cursor(cursor: str) -> list:
+    """Inverse of encode_cursor; raises ValueError on a malformed cursor."""
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except Exception:
+        raise ValueError("Invalid cursor")
+    if not isinstance(values, list):
+        raise ValueError("Invalid cursor")
+    return values
+
+
+async def stream_json_page(items, field: str, limit: int, cursor_for, extra: dict = None):
+    """Serialize a page of items as a JSON object while they are being read.
+
+    `items` should yield at most limit + 1 items; the extra one only tells
+    us another page exists. Yields the body {field: [...], "count": n,
+    "next_cursor": cursor or null, **extra} in pieces.
+    """
+    yield f'{{"{field}": ['.encode()
+    count = 0
+    last = None
+    next_cursor = None
+    async for item in items:
+        if count == limit:
+            next_cursor = cursor_for(last)
+            continue
+        yield (b"," if count else b"") + json.dumps(item).encode()
+        last = item
+        count += 1
+    tail = {"count": count, "next_cursor": next_cursor, **(extra or {})}
+    yield b"], " + json.dumps(tail)[1:].encode()
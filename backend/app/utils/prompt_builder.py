@@ -13,10 +13,12 @@ IMPORTANT INSTRUCTIONS:
 PASSAGES:
 """
     
-    body = ""
+    parts = [header]
     for i, p in enumerate(passages, start=1):
         page_info = f"Page {p.get('page', 'N/A')}" if p.get('page') else "Document"
-        body += f"\n[Passage {i}] ({page_info})\n{p.get('text', '')}\n"
+        if p.get('page') and p.get('page_end', p['page']) != p['page']:
+            page_info = f"Pages {p['page']}-{p['page_end']}"
+        parts.append(f"\n[Passage {i}] ({page_info})\n{p.get('text', '')}\n")
     
     tail = f"""
 
@@ -30,7 +32,8 @@ ANSWER FORMAT:
 
 ANSWER:"""
     
-    return header + body + tail
+    parts.append(tail)
+    return "".join(parts)
 
 
 def clean_answer(answer: str) -> str:
@@ -66,3 +69,98 @@ def clean_answer(answer: str) -> str:
     answer = '\n'.join(cleaned_lines).rstrip()
     
     return answer
+
+
+class AnswerCleaner:
+    """Incremental counterpart of clean_answer for streamed tokens.
+
+    Text is emitted as soon as the formatting of its line is known; blank
+    lines and trailing whitespace are held back until more content arrives,
+    so the concatenated output matches clean_answer on the full answer.
+    """
+
+    BULLETS = ('-', '•', '*')
+
+    def __init__(self):
+        self._buffer = ""
+        self._open = False
+        self._held = ""
+        self._started = False
+        self._blanks = 0
+        self._after_empty = False
+        self._tail = ""
+        self._prefix_done = False
+
+    def feed(self, text: str) -> str:
+        """Consume a chunk of raw model output and return cleaned text to send."""
+        self._buffer += text
+        out = []
+        while "\n" in self._buffer:
+            line, self._buffer = self._buffer.split("\n", 1)
+            out.append(self._emit(line, final=True))
+        out.append(self._emit(self._buffer, final=False))
+        return "".join(out)
+
+    def flush(self) -> str:
+        """Return whatever is left once the stream has ended."""
+        line, self._buffer = self._buffer, ""
+        return self._emit(line, final=True)
+
+    def _emit(self, text: str, final: bool) -> str:
+        if self._open:
+            if final:
+                self._open = False
+                content, self._held = (self._held + text).rstrip(), ""
+                return content
+            self._buffer = ""
+            stripped = text.rstrip()
+            if not stripped:
+                self._held += text
+                return ""
+            content, self._held = self._held + stripped, text[len(stripped):]
+            return content
+
+        content = text.strip() if final else text.lstrip()
+        if not self._prefix_done and content:
+            if final:
+                self._prefix_done = True
+            if content.startswith("ANSWER:"):
+                content = content[7:].lstrip()
+            elif not final and "ANSWER:".startswith(content):
+                return ""
+        if not content.strip():
+            if final and self._started:
+                # Runs of empty lines collapse to one; whitespace-only lines each count
+                if text or not self._after_empty:
+                    self._blanks += 1
+                self._after_empty = not text
+            return ""
+        is_bullet = content[0] in self.BULLETS
+        if not final and is_bullet and not content[1:].strip():
+            return ""
+
+        prefix = "- " if is_bullet else ""
+        if is_bullet:
+            line = content[1:].lstrip()
+        elif self._started:
+            line = text
+        else:
+            line = content
+        separator = self._tail + "\n" * (1 + self._blanks) if self._started else ""
+        self._started = True
+        self._prefix_done = True
+        self._blanks = 0
+        self._after_empty = False
+        self._tail = ""
+
+        if final:
+            # A bare bullet keeps its "- " unless it ends the answer
+            formatted = prefix + line.rstrip()
+            stripped = formatted.rstrip()
+            self._tail = formatted[len(stripped):]
+            return separator + stripped
+        self._open = True
+        self._buffer = ""
+        stripped = line.rstrip()
+        self._held = line[len(stripped):]
+        return separator + prefix + stripped
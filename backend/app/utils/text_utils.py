@@ -1,10 +1,36 @@
-def chunk_text(text: str, chunk_size: int = 500, overlap: int = 100):
-    """Yields successive overlapping chunks from text."""
-    if chunk_size <= overlap:
-        raise ValueError("chunk_size must be greater than overlap")
-
-    start = 0
-    while start < len(text):
-        end = start + chunk_size
-        yield text[start:end]
-        start += chunk_size - overlap
+import hashlib
+import re
+import unicodedata
+
+_TOKEN_RE = re.compile(r"\w+(?:[-./]\w+)*")
+_SPLIT_RE = re.compile(r"[-./]")
+_SPACE_RE = re.compile(r"\s+")
+_PARAGRAPH_RE = re.compile(r"\n\s*\n")
+_SENTENCE_RE = re.compile(r"(?<=[.!?])\s+(?=[\"'(\[A-Z])")
+
+def split_sentences(text: str) -> list:
+    """Split text into (sentence, ends_paragraph) pairs with whitespace collapsed."""
+    sentences = []
+    for paragraph in _PARAGRAPH_RE.split(text):
+        parts = [_SPACE_RE.sub(" ", s).strip() for s in _SENTENCE_RE.split(paragraph)]
+        parts = [s for s in parts if s]
+        sentences.extend((s, i == len(parts) - 1) for i, s in enumerate(parts))
+    return sentences
+
+def tokenize(text: str) -> list:
+    """Lowercased word tokens for lexical search.
+
+    Identifiers such as "E-1042" or "4.2.1" are kept whole and also split
+    into their parts, so both exact and partial lookups match.
+    """
+    tokens = []
+    for match in _TOKEN_RE.findall(text.lower()):
+        tokens.append(match)
+        if _SPLIT_RE.search(match):
+            tokens.extend(part for part in _SPLIT_RE.split(match) if part)
+    return tokens
+
+def text_hash(text: str) -> str:
+    """Hash of a passage's text after Unicode and whitespace normalization."""
+    normalized = _SPACE_RE.sub(" ", unicodedata.normalize("NFKC", text)).strip()
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
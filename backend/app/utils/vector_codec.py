@@ -0,0 +1,46 @@
+import numpy as np
+from bson.binary import Binary
+
+FORMATS = ("float32", "float16", "int8")
+EMBEDDING_FIELDS = ("embedding", "embedding_format", "embedding_scale")
+
+
+def encode_embedding(vector, fmt: str = "float32") -> dict:
+    """Pack one embedding into the passage fields used to store it.
+
+    float32 and float16 are stored as raw little-endian bytes; int8 is
+    symmetric-quantized per vector and keeps its scale alongside.
+    """
+    vector = np.asarray(vector, dtype=np.float32)
+    if fmt == "float32":
+        return {"embedding": Binary(vector.astype("<f4").tobytes()), "embedding_format": fmt}
+    if fmt == "float16":
+        return {"embedding": Binary(vector.astype("<f2").tobytes()), "embedding_format": fmt}
+    if fmt == "int8":
+        scale = float(np.abs(vector).max()) / 127 or 1.0
+        quantized = np.clip(np.rint(vector / scale), -127, 127).astype(np.int8)
+        return {
+            "embedding": Binary(quantized.tobytes()),
+            "embedding_format": fmt,
+            "embedding_scale": scale
+        }
+    raise ValueError(f"Unknown embedding format: {fmt}")
+
+
+def decode_embedding(passage: dict) -> np.ndarray:
+    """Return a passage's embedding as float32, whatever format it was stored in.
+
+    float32 rows are a zero-copy view over the BSON bytes; passages written
+    before binary storage still hold a plain list of floats.
+    """
+    data = passage["embedding"]
+    fmt = passage.get("embedding_format")
+    if fmt is None:
+        return np.asarray(data, dtype=np.float32)
+    if fmt == "float32":
+        return np.frombuffer(data, dtype="<f4")
+    if fmt == "float16":
+        return np.frombuffer(data, dtype="<f2").astype(np.float32)
+    if fmt == "int8":
+        return np.frombuffer(data, dtype=np.int8).astype(np.float32) * passage["embedding_scale"]
+    raise ValueError(f"Unknown embedding format: {fmt}")
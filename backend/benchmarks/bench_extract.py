@@ -0,0 +1,54 @@
+"""Compare serial and process-parallel PDF text extraction.
+
+Usage (from backend/):
+    python -m benchmarks.bench_extract --pages 200 500 --workers 2 4
+    python -m benchmarks.bench_extract --pdf path/to/manual.pdf
+"""
+import argparse
+import os
+import tempfile
+import time
+from app.services.extractor import iter_pages, iter_pages_parallel
+from benchmarks.synthetic import make_pdf
+
+
+def run_serial(path):
+    with open(path, "rb") as f:
+        return sum(1 for _ in iter_pages(f))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pdf", help="benchmark an existing PDF instead of synthetic ones")
+    parser.add_argument("--pages", type=int, nargs="+", default=[200, 500])
+    parser.add_argument("--workers", type=int, nargs="+", default=[2, 4])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.pdf:
+            paths = [args.pdf]
+        else:
+            paths = []
+            for pages in args.pages:
+                path = os.path.join(tmp, f"synthetic_{pages}.pdf")
+                make_pdf(path, pages)
+                paths.append(path)
+
+        for path in paths:
+            start = time.perf_counter()
+            pages = run_serial(path)
+            serial = time.perf_counter() - start
+            print(f"{os.path.basename(path)}: {pages} pages, serial {serial:.2f}s")
+
+            for workers in args.workers:
+                # The first run also starts the worker pool; later documents reuse it
+                for run in ("cold", "warm"):
+                    start = time.perf_counter()
+                    count = sum(1 for _ in iter_pages_parallel(path, workers=workers))
+                    parallel = time.perf_counter() - start
+                    assert count == pages
+                    print(f"  {workers} workers, {run} pool: {parallel:.2f}s ({serial / parallel:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""Compare embedding storage formats: BSON size, decode time and recall.
+
+Usage (from backend/):
+    python -m benchmarks.bench_storage --passages 20000
+"""
+import argparse
+import time
+import bson
+import numpy as np
+from app.services.vector_index import ExactIndex
+from app.utils.vector_codec import FORMATS, decode_embedding, encode_embedding
+
+
+def clustered_embeddings(rng, n, dim, clusters=200):
+    centers = rng.standard_normal((clusters, dim))
+    vectors = centers[rng.integers(0, clusters, n)] + 0.6 * rng.standard_normal((n, dim))
+    return vectors.astype(np.float32)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--passages", type=int, default=20000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=8)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    vectors = clustered_embeddings(rng, args.passages, args.dim)
+    queries = vectors[rng.choice(args.passages, args.queries)] + 0.3 * rng.standard_normal((args.queries, args.dim))
+    ids = [str(i) for i in range(args.passages)]
+
+    reference = ExactIndex()
+    reference.add(ids, vectors)
+    truth = [set(found) for found, _ in reference.search_batch(queries, args.top_k)]
+
+    print(f"{'format':>8} {'bytes/passage':>14} {'load ms':>9} {'recall@k':>9}")
+    for fmt in ("list",) + FORMATS:
+        if fmt == "list":
+            docs = [{"embedding": v.tolist()} for v in vectors]
+        else:
+            docs = [encode_embedding(v, fmt) for v in vectors]
+        raw = b"".join(bson.encode(doc) for doc in docs)
+
+        start = time.perf_counter()
+        decoded = np.stack([decode_embedding(doc) for doc in bson.decode_all(raw)])
+        load_ms = (time.perf_counter() - start) * 1000
+
+        index = ExactIndex()
+        index.add(ids, decoded)
+        results = index.search_batch(queries, args.top_k)
+        recall = np.mean([len(t & set(found)) / args.top_k for t, (found, _) in zip(truth, results)])
+        print(f"{fmt:>8} {len(raw) / args.passages:14.0f} {load_ms:9.1f} {recall:9.3f}")
+
+
+if __name__ == "__main__":
+    main()
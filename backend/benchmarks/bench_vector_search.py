@@ -0,0 +1,68 @@
+"""Compare vector_search scoring backends on synthetic embeddings.
+
+Usage (from backend/):
+    python -m benchmarks.bench_vector_search --sizes 10000 100000 1000000
+"""
+import argparse
+import time
+import numpy as np
+from app.services.vector_index import ExactIndex, IVFIndex
+
+
+def legacy_scores(query, passages, top_k):
+    """Per-passage cosine loop + full sort, as in vectorstore._legacy_vector_search."""
+    scored = []
+    for passage in passages:
+        vec1 = np.array(query)
+        vec2 = np.array(passage)
+        score = np.dot(vec1, vec2) / (np.linalg.norm(vec1) * np.linalg.norm(vec2))
+        scored.append(score)
+    scored.sort(reverse=True)
+    return scored[:top_k]
+
+
+def timed(fn, repeats):
+    start = time.perf_counter()
+    for _ in range(repeats):
+        fn()
+    return (time.perf_counter() - start) / repeats * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000, 1000000])
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=16)
+    parser.add_argument("--top-k", type=int, default=8)
+    parser.add_argument("--legacy-max", type=int, default=100000,
+                        help="skip the legacy loop above this corpus size")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    queries = rng.standard_normal((args.queries, args.dim)).astype(np.float32)
+
+    print(f"{'passages':>10} {'legacy ms':>10} {'exact ms':>10} {'exact batch ms/q':>17} {'ivf ms':>8}")
+    for size in args.sizes:
+        vectors = rng.standard_normal((size, args.dim)).astype(np.float32)
+        ids = [str(i) for i in range(size)]
+
+        exact = ExactIndex()
+        exact.add(ids, vectors)
+        ivf = IVFIndex()
+        ivf.add(ids, vectors)
+
+        if size <= args.legacy_max:
+            passages = vectors.tolist()
+            query = queries[0].tolist()
+            legacy_ms = f"{timed(lambda: legacy_scores(query, passages, args.top_k), 1):10.1f}"
+        else:
+            legacy_ms = f"{'-':>10}"
+
+        exact_ms = timed(lambda: exact.search(queries[0], args.top_k), 5)
+        batch_ms = timed(lambda: exact.search_batch(queries, args.top_k), 3) / args.queries
+        ivf_ms = timed(lambda: ivf.search(queries[0], args.top_k), 20)
+        print(f"{size:>10} {legacy_ms} {exact_ms:10.2f} {batch_ms:17.2f} {ivf_ms:8.2f}")
+
+
+if __name__ == "__main__":
+    main()
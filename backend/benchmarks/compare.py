@@ -0,0 +1,58 @@
+"""Compare two benchmark result files written by benchmarks.suite.
+
+Latencies (ms, seconds) are better lower; throughputs (per_sec, rps) are
+better higher. Changes beyond --threshold in the wrong direction are flagged.
+
+Usage (from backend/):
+    python -m benchmarks.compare bench-old.json bench-new.json --threshold 10
+"""
+import argparse
+import json
+
+
+def metrics(results: dict) -> dict:
+    """Flatten the comparable numbers into {name: value}."""
+    flat = {}
+    for row in results.get("vector_search", []):
+        for key in ("p50_ms", "p99_ms"):
+            flat[f"vector_search n={row['corpus_size']} {key}"] = row[key]
+    for row in results.get("upload", []):
+        flat[f"upload pages={row['pages']} pages_per_sec"] = row["pages_per_sec"]
+        flat[f"upload pages={row['pages']} chunks_per_sec"] = row["chunks_per_sec"]
+    for row in results.get("search_load", {}).get("levels", []):
+        for key in ("throughput_rps", "p50_ms", "p99_ms"):
+            flat[f"search c={row['concurrency']} {key}"] = row[key]
+    return flat
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    parser.add_argument("--threshold", type=float, default=10, help="percent change to flag")
+    args = parser.parse_args()
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.candidate) as f:
+        candidate = json.load(f)
+    old, new = metrics(baseline), metrics(candidate)
+
+    print(f"baseline  {baseline.get('commit')}\ncandidate {candidate.get('commit')}\n")
+    regressions = 0
+    for name in sorted(old.keys() & new.keys()):
+        change = (new[name] - old[name]) / old[name] * 100 if old[name] else 0.0
+        higher_is_better = name.endswith(("per_sec", "rps"))
+        worse = -change if higher_is_better else change
+        flag = ""
+        if worse > args.threshold:
+            flag = "  REGRESSION"
+            regressions += 1
+        elif -worse > args.threshold:
+            flag = "  improved"
+        print(f"{name:<45} {old[name]:10.2f} -> {new[name]:10.2f}  {change:+7.1f}%{flag}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,82 @@
+"""Concurrent load test for /api/search against a running backend.
+
+Throughput should grow with concurrency until the CPU pool or Ollama is
+saturated; a flat line means requests are being serialized.
+
+Usage (from backend/, requires httpx):
+    python -m benchmarks.load_search --url http://localhost:8000 \
+        --email me@example.com --password secret --concurrency 1 4 16 64
+"""
+import argparse
+import asyncio
+import time
+import httpx
+import numpy as np
+
+
+async def login(client: httpx.AsyncClient, email: str, password: str) -> str:
+    response = await client.post("/api/auth/login", json={"email": email, "password": password})
+    response.raise_for_status()
+    return response.json()["access_token"]
+
+
+async def run_level(client, token, queries, concurrency, requests_per_level):
+    latencies = []
+    errors = 0
+    sent = 0
+
+    async def worker():
+        nonlocal errors, sent
+        while sent < requests_per_level:
+            query = queries[sent % len(queries)]
+            sent += 1
+            start = time.perf_counter()
+            response = await client.get(
+                "/api/search",
+                params={"q": query},
+                headers={"Authorization": f"Bearer {token}"}
+            )
+            latencies.append(time.perf_counter() - start)
+            if response.status_code != 200:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    latencies = np.array(latencies) * 1000
+    return {
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "errors": errors,
+        "throughput_rps": len(latencies) / elapsed,
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p99_ms": float(np.percentile(latencies, 99)),
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--token")
+    parser.add_argument("--email")
+    parser.add_argument("--password")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16, 64])
+    parser.add_argument("--requests", type=int, default=200, help="requests per concurrency level")
+    parser.add_argument("--query", action="append", help="query to send (repeatable)")
+    args = parser.parse_args()
+
+    queries = args.query or ["What is the warranty period?", "How do I reset the device?"]
+    limits = httpx.Limits(max_connections=max(args.concurrency))
+    async with httpx.AsyncClient(base_url=args.url, timeout=120, limits=limits) as client:
+        token = args.token or await login(client, args.email, args.password)
+        print(f"{'concurrency':>11} {'req/s':>8} {'p50 ms':>9} {'p99 ms':>9} {'errors':>7}")
+        for concurrency in args.concurrency:
+            result = await run_level(client, token, queries, concurrency, args.requests)
+            print(
+                f"{result['concurrency']:>11} {result['throughput_rps']:8.1f} "
+                f"{result['p50_ms']:9.1f} {result['p99_ms']:9.1f} {result['errors']:>7}"
+            )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,124 @@
+"""Local stand-ins for the services the backend talks to: MongoDB and Ollama."""
+import json
+import shutil
+import socket
+import subprocess
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+@contextmanager
+def local_mongod(binary: str = "mongod", timeout: float = 30):
+    """Run a throwaway mongod on a free port with a temporary data directory.
+
+    Yields its connection URI; the process and its data are removed on exit.
+    """
+    if shutil.which(binary) is None:
+        raise RuntimeError(f"{binary} not found on PATH; pass --mongo-uri to use a running scratch instance")
+    dbpath = tempfile.mkdtemp(prefix="kb-bench-mongo-")
+    port = free_port()
+    process = subprocess.Popen(
+        [binary, "--dbpath", dbpath, "--port", str(port), "--bind_ip", "127.0.0.1", "--quiet"],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                with socket.create_connection(("127.0.0.1", port), timeout=0.5):
+                    break
+            except OSError:
+                if process.poll() is not None or time.monotonic() > deadline:
+                    raise RuntimeError("mongod did not start")
+                time.sleep(0.1)
+        yield f"mongodb://127.0.0.1:{port}/"
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+        shutil.rmtree(dbpath, ignore_errors=True)
+
+
+class _OllamaHandler(BaseHTTPRequestHandler):
+    """Answers /api/generate like Ollama, after a configurable delay."""
+
+    def log_message(self, format, *args):
+        pass
+
+    def _part(self, text: str, done: bool) -> bytes:
+        return json.dumps({
+            "model": self.server.model,
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "response": text,
+            "done": done
+        }).encode() + b"\n"
+
+    def do_GET(self):
+        body = json.dumps({"models": [{"name": self.server.model}]}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        server = self.server
+        tokens = (["- Stub"] + [" answer"] * (server.tokens - 1))[:server.tokens]
+        time.sleep(server.first_token_ms / 1000)
+
+        if not request.get("stream", True):
+            time.sleep(server.token_ms * max(len(tokens) - 1, 0) / 1000)
+            body = self._part("ANSWER:\n" + "".join(tokens), True)
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for i, token in enumerate(tokens):
+            if i:
+                time.sleep(server.token_ms / 1000)
+            self._write_chunk(self._part(token, False))
+        self._write_chunk(self._part("", True))
+        self.wfile.write(b"0\r\n\r\n")
+
+    def _write_chunk(self, data: bytes):
+        self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+        self.wfile.flush()
+
+
+@contextmanager
+def stub_ollama(first_token_ms: float = 200, token_ms: float = 20, tokens: int = 60, model: str = "llama3"):
+    """Serve a fake Ollama on a free port; yields its base URL.
+
+    Each generation waits `first_token_ms`, then emits `tokens` tokens
+    `token_ms` apart, so LLM latency is fixed and known.
+    """
+    server = ThreadingHTTPServer(("127.0.0.1", free_port()), _OllamaHandler)
+    server.daemon_threads = True
+    server.first_token_ms = first_token_ms
+    server.token_ms = token_ms
+    server.tokens = tokens
+    server.model = model
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{server.server_address[1]}"
+    finally:
+        server.shutdown()
+        server.server_close()
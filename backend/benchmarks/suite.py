@@ -0,0 +1,251 @@
+"""End-to-end benchmark suite: upload throughput, vector_search and /api/search latency.
+
+Runs everything locally: a throwaway mongod (or --mongo-uri, which must be a
+scratch instance; the suite writes to its knowledge_base database), a stub
+Ollama with fixed latency, and the backend itself under uvicorn. Corpora are
+synthetic and seeded, so runs on different commits are comparable. Results
+are written as JSON; compare two runs with benchmarks.compare.
+
+Usage (from backend/, requires mongod on PATH and httpx):
+    python -m benchmarks.suite --out bench-new.json
+    python -m benchmarks.suite --corpus-sizes 1000 10000 100000 --concurrency 1 8 32
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import ExitStack
+from datetime import datetime, timezone
+import numpy as np
+from benchmarks.bench_storage import clustered_embeddings
+from benchmarks.stubs import free_port, local_mongod, stub_ollama
+from benchmarks.synthetic import make_pdf, synthetic_text
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def percentiles(seconds: list) -> dict:
+    ms = np.array(seconds) * 1000
+    return {
+        "p50_ms": float(np.percentile(ms, 50)),
+        "p99_ms": float(np.percentile(ms, 99)),
+        "mean_ms": float(ms.mean())
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "HEAD"], cwd=BACKEND_DIR, text=True, stderr=subprocess.DEVNULL
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def seed_corpus(user_id: str, size: int, start: int, rng: np.random.Generator):
+    """Add passages start..size-1 with synthetic text and clustered random embeddings."""
+    from app.services.embeddings import load_model
+    from app.services.vectorstore import create_document, insert_passage_batch, unique_passages
+
+    dim = load_model().get_sentence_embedding_dimension()
+    doc_id = create_document(f"corpus-{start}-{size}", user_id)
+    for batch_start in range(start, size, 1000):
+        count = min(1000, size - batch_start)
+        passages = list(unique_passages((
+            {"page": batch_start + i + 1, "text": f"[{batch_start + i}] " + synthetic_text(rng, 60), "tokens": 80}
+            for i in range(count)
+        ), set()))
+        vectors = clustered_embeddings(rng, count, dim)
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+        insert_passage_batch(doc_id, "corpus", user_id, passages, vectors)
+
+
+async def bench_vector_search(sizes: list, queries: int, rng: np.random.Generator) -> list:
+    """vector_search latency as one user's corpus grows through `sizes`."""
+    from app.services.vectorstore import vector_search
+
+    user_id = "bench-corpus"
+    results = []
+    seeded = 0
+    for size in sorted(sizes):
+        started = time.perf_counter()
+        seed_corpus(user_id, size, seeded, rng)
+        seed_seconds = time.perf_counter() - started
+        seeded = size
+
+        started = time.perf_counter()
+        await vector_search(synthetic_text(rng, 8), user_id)
+        first_seconds = time.perf_counter() - started
+
+        latencies = []
+        for _ in range(queries):
+            started = time.perf_counter()
+            await vector_search(synthetic_text(rng, 8), user_id)
+            latencies.append(time.perf_counter() - started)
+        results.append({
+            "corpus_size": size,
+            "queries": queries,
+            "seed_seconds": seed_seconds,
+            "first_query_ms": first_seconds * 1000,
+            **percentiles(latencies)
+        })
+        print(f"vector_search  n={size:>8}  p50 {results[-1]['p50_ms']:7.2f} ms  p99 {results[-1]['p99_ms']:7.2f} ms")
+    return results
+
+
+def start_server(port: int, workers: int, env: dict) -> subprocess.Popen:
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1",
+         "--port", str(port), "--workers", str(workers), "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=env
+    )
+
+
+async def wait_ready(client, server: subprocess.Popen, timeout: float = 300):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError("backend exited during startup")
+        try:
+            if (await client.get("/api/ready")).status_code == 200:
+                return
+        except Exception:
+            pass
+        await asyncio.sleep(0.2)
+    raise RuntimeError("backend did not become ready")
+
+
+async def bench_uploads(client, token: str, page_counts: list, workdir: str) -> list:
+    """Upload synthetic PDFs one at a time and time them until their job completes."""
+    headers = {"Authorization": f"Bearer {token}"}
+    results = []
+    for pages in page_counts:
+        path = os.path.join(workdir, f"bench-{pages}.pdf")
+        make_pdf(path, pages, seed=pages)
+        with open(path, "rb") as f:
+            data = f.read()
+
+        started = time.perf_counter()
+        response = await client.post(
+            "/api/upload", headers=headers,
+            data={"title": f"bench {pages} pages"},
+            files={"file": (os.path.basename(path), data, "application/pdf")}
+        )
+        response.raise_for_status()
+        job_id = response.json()["job_id"]
+        while True:
+            job = (await client.get(f"/api/jobs/{job_id}", headers=headers)).json()
+            if job["status"] in ("completed", "failed"):
+                break
+            await asyncio.sleep(0.05)
+        elapsed = time.perf_counter() - started
+
+        chunks = job.get("chunks_total") or 0
+        results.append({
+            "pages": pages,
+            "bytes": len(data),
+            "status": job["status"],
+            "seconds": elapsed,
+            "pages_per_sec": pages / elapsed,
+            "chunks": chunks,
+            "chunks_per_sec": chunks / elapsed,
+            "stage_seconds": job.get("stage_seconds")
+        })
+        print(f"upload  pages={pages:>6}  {elapsed:7.2f} s  {pages / elapsed:7.1f} pages/s  {job['status']}")
+    return results
+
+
+async def run_http(args, env: dict, workdir: str, rng: np.random.Generator) -> dict:
+    import httpx
+    from benchmarks.load_search import run_level
+
+    port = free_port()
+    server = start_server(port, args.server_workers, env)
+    try:
+        limits = httpx.Limits(max_connections=max(args.concurrency))
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=300, limits=limits) as client:
+            await wait_ready(client, server)
+            response = await client.post("/api/auth/register", json={
+                "email": "bench@example.com", "password": "bench-password", "name": "Bench"
+            })
+            response.raise_for_status()
+            token = response.json()["access_token"]
+            user_id = response.json()["user"]["id"]
+
+            uploads = await bench_uploads(client, token, args.upload_pages, workdir)
+
+            # Unique queries, so neither the answer cache nor the query cache hides the work
+            seed_corpus(user_id, args.search_corpus, 0, rng)
+            queries = [synthetic_text(rng, 8) for _ in range(args.requests * len(args.concurrency))]
+            levels = []
+            for i, concurrency in enumerate(args.concurrency):
+                level_queries = queries[i * args.requests:(i + 1) * args.requests]
+                levels.append(await run_level(client, token, level_queries, concurrency, args.requests))
+                print(
+                    f"/api/search  c={concurrency:>4}  {levels[-1]['throughput_rps']:7.1f} req/s  "
+                    f"p50 {levels[-1]['p50_ms']:8.1f} ms  p99 {levels[-1]['p99_ms']:8.1f} ms"
+                )
+            return {"upload": uploads, "search_load": {"corpus_size": args.search_corpus, "levels": levels}}
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--out", help="results file (default: bench-<commit>.json)")
+    parser.add_argument("--mongo-uri", help="scratch MongoDB to use instead of starting mongod")
+    parser.add_argument("--mongod", default="mongod", help="mongod binary for the throwaway instance")
+    parser.add_argument("--corpus-sizes", type=int, nargs="+", default=[1000, 10000, 50000])
+    parser.add_argument("--queries", type=int, default=200, help="vector_search queries per corpus size")
+    parser.add_argument("--upload-pages", type=int, nargs="+", default=[10, 100])
+    parser.add_argument("--search-corpus", type=int, default=10000, help="passages behind the /api/search load test")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--requests", type=int, default=200, help="/api/search requests per concurrency level")
+    parser.add_argument("--server-workers", type=int, default=1)
+    parser.add_argument("--llm-first-token-ms", type=float, default=200)
+    parser.add_argument("--llm-token-ms", type=float, default=20)
+    parser.add_argument("--llm-tokens", type=int, default=60)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    commit = git_commit()
+    rng = np.random.default_rng(args.seed)
+    with ExitStack() as stack:
+        mongo_uri = args.mongo_uri or stack.enter_context(local_mongod(args.mongod))
+        ollama_url = stack.enter_context(stub_ollama(args.llm_first_token_ms, args.llm_token_ms, args.llm_tokens))
+        workdir = stack.enter_context(tempfile.TemporaryDirectory(prefix="kb-bench-"))
+
+        # Config reads the environment at import, so set it before touching app.*
+        os.environ.update({
+            "MONGO_URI": mongo_uri,
+            "OLLAMA_BASE_URL": ollama_url,
+            "INDEX_DIR": os.path.join(workdir, "indexes"),
+            "UPLOAD_DIR": os.path.join(workdir, "uploads"),
+            "QUERY_CACHE_PATH": "",
+            "PRELOAD_USER_IDS": ""
+        })
+        env = dict(os.environ)
+
+        started = time.perf_counter()
+        results = {
+            "commit": commit,
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "settings": vars(args),
+            "vector_search": asyncio.run(bench_vector_search(args.corpus_sizes, args.queries, rng))
+        }
+        results.update(asyncio.run(run_http(args, env, workdir, rng)))
+        results["total_seconds"] = time.perf_counter() - started
+
+    out = args.out or f"bench-{(commit or 'unknown')[:10]}.json"
+    with open(out, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"results written to {out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+"""Synthetic corpora for the benchmarks."""
+import numpy as np
+
+WORDS = (
+    "invoice clause warranty pump valve pressure sensor error code manual section "
+    "install configure reset firmware voltage torque bearing seal replace inspect "
+    "schedule maintenance safety warning compliance audit policy contract term"
+).split()
+
+
+def synthetic_text(rng: np.random.Generator, words: int) -> str:
+    """Random prose with a sentence break roughly every 12 words."""
+    tokens = rng.choice(WORDS, size=words)
+    sentences = [" ".join(tokens[i:i + 12]).capitalize() + "." for i in range(0, words, 12)]
+    return " ".join(sentences)
+
+
+def make_pdf(path: str, pages: int, words_per_page: int = 400, seed: int = 0):
+    """Write a text-only PDF with `pages` pages of synthetic prose."""
+    rng = np.random.default_rng(seed)
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = {}
+
+    def add(num: int, data: bytes):
+        offsets[num] = len(out)
+        out.extend(f"{num} 0 obj\n".encode() + data + b"\nendobj\n")
+
+    page_nums = [4 + 2 * i for i in range(pages)]
+    add(1, b"<< /Type /Catalog /Pages 2 0 R >>")
+    kids = " ".join(f"{n} 0 R" for n in page_nums)
+    add(2, f"<< /Type /Pages /Kids [{kids}] /Count {pages} >>".encode())
+    add(3, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+
+    for num in page_nums:
+        text = synthetic_text(rng, words_per_page)
+        lines = [text[i:i + 90] for i in range(0, len(text), 90)]
+        stream = ("BT /F1 9 Tf 36 800 Td 11 TL " + " ".join(f"({line}) '" for line in lines) + " ET").encode()
+        add(num, (
+            "<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 842] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {num + 1} 0 R >>"
+        ).encode())
+        add(num + 1, f"<< /Length {len(stream)} >>\nstream\n".encode() + stream + b"\nendstream")
+
+    xref = len(out)
+    out.extend(f"xref\n0 {len(offsets) + 1}\n0000000000 65535 f \n".encode())
+    for num in sorted(offsets):
+        out.extend(f"{offsets[num]:010d} 00000 n \n".encode())
+    out.extend(f"trailer << /Size {len(offsets) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode())
+    with open(path, "wb") as f:
+        f.write(out)
@@ -0,0 +1,63 @@
+"""Fail if importing the app gets slow or pulls in heavy dependencies.
+
+Imports `app.main` in a fresh interpreter with `-X importtime`, then checks
+the total against a budget and that none of the modules which should load
+lazily (torch, sentence-transformers, ...) were imported.
+
+Usage (from backend/):
+    python -m scripts.check_import_time --budget-ms 1500
+"""
+import argparse
+import json
+import subprocess
+import sys
+
+LAZY_MODULES = ("torch", "sentence_transformers", "transformers")
+
+PROBE = (
+    "import json, sys; import {module}; "
+    "print(json.dumps(sorted(m for m in sys.modules if m.split('.')[0] in {lazy!r})))"
+)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--module", default="app.main")
+    parser.add_argument("--budget-ms", type=float, default=1500)
+    parser.add_argument("--top", type=int, default=10, help="slowest imports to print")
+    args = parser.parse_args()
+
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", PROBE.format(module=args.module, lazy=LAZY_MODULES)],
+        capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        print(result.stderr)
+        sys.exit(result.returncode)
+
+    # importtime lines: "import time: self [us] | cumulative | imported package"
+    timings = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        timings.append((int(cumulative), name.rstrip()))
+    total_ms = next(us for us, name in timings if name.strip() == args.module) / 1000
+    heavy = json.loads(result.stdout.strip().splitlines()[-1])
+
+    print(f"import {args.module}: {total_ms:.0f} ms (budget {args.budget_ms:.0f} ms)")
+    for us, name in sorted(timings, reverse=True)[:args.top]:
+        print(f"  {us / 1000:8.1f} ms  {name.strip()}")
+
+    failed = False
+    if heavy:
+        print(f"FAIL: imported eagerly: {', '.join(heavy)}")
+        failed = True
+    if total_ms > args.budget_ms:
+        print("FAIL: import time over budget")
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
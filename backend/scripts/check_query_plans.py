@@ -0,0 +1,76 @@
+"""Fail if a hot query would fall back to a collection scan.
+
+Creates the startup indexes, then runs `explain` on the query shape of
+every hot path and exits non-zero when a winning plan contains COLLSCAN.
+
+Usage (from backend/, against a real MongoDB):
+    python -m scripts.check_query_plans
+"""
+import asyncio
+import sys
+from bson.objectid import ObjectId
+from app.db.mongo import db, ensure_indexes
+
+SAMPLE_USER = "000000000000000000000000"
+
+# (description, collection, filter, sort, projection)
+HOT_QUERIES = [
+    ("vector index build", "passages", {"user_id": SAMPLE_USER}, None,
+     {"embedding": 1, "embedding_format": 1, "embedding_scale": 1}),
+    ("top-k passage fetch", "passages",
+     {"_id": {"$in": [ObjectId()]}, "user_id": SAMPLE_USER}, None,
+     {"embedding": 0, "embedding_format": 0, "embedding_scale": 0}),
+    ("passages by document", "passages", {"user_id": SAMPLE_USER, "doc_id": SAMPLE_USER}, None, None),
+    ("known chunk hashes", "passages", {"user_id": SAMPLE_USER, "text_hash": {"$in": ["0" * 64]}}, None,
+     {"text_hash": 1}),
+    ("document list", "documents", {"user_id": SAMPLE_USER, "_id": {"$gt": ObjectId()}}, {"_id": 1},
+     {"title": 1}),
+    ("chat history list", "chat_history",
+     {"user_id": SAMPLE_USER, "$or": [
+         {"created_at": {"$lt": "2025-01-01T00:00:00+05:30"}},
+         {"created_at": "2025-01-01T00:00:00+05:30", "_id": {"$lt": ObjectId()}}
+     ]}, {"created_at": -1, "_id": -1},
+     {"title": 1, "created_at": 1, "updated_at": 1}),
+    ("chat message page", "chat_message_buckets",
+     {"chat_id": SAMPLE_USER, "bucket": {"$gte": 1, "$lte": 2}}, {"bucket": 1}, None),
+    ("login", "users", {"email": "someone@example.com"}, None, None),
+    ("answer cache lookup", "answer_cache", {"user_id": SAMPLE_USER, "key": "0" * 64}, None, None),
+]
+
+
+def plan_stages(plan):
+    """Yield every stage name in an explain plan tree."""
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            yield plan["stage"]
+        for value in plan.values():
+            yield from plan_stages(value)
+    elif isinstance(plan, list):
+        for item in plan:
+            yield from plan_stages(item)
+
+
+def main():
+    asyncio.run(ensure_indexes())
+
+    failures = 0
+    for description, collection, query, sort, projection in HOT_QUERIES:
+        command = {"find": collection, "filter": query}
+        if sort:
+            command["sort"] = sort
+        if projection:
+            command["projection"] = projection
+        explain = db.command("explain", command, verbosity="queryPlanner")
+        stages = list(plan_stages(explain["queryPlanner"]["winningPlan"]))
+        status = "COLLSCAN" if "COLLSCAN" in stages else "ok"
+        if status != "ok":
+            failures += 1
+        print(f"{status:>8}  {description}: {' <- '.join(stages)}")
+
+    if failures:
+        print(f"{failures} hot queries regressed to a collection scan")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""Convert stored passage embeddings to another storage format.
+
+Rewrites passages whose embedding is a plain BSON float list (or is stored
+in a different format) as packed binary. Safe to re-run; already converted
+passages are skipped.
+
+Usage (from backend/):
+    python -m scripts.migrate_embeddings --format float32
+    python -m scripts.migrate_embeddings --format int8 --user <user_id>
+"""
+import argparse
+from pymongo import UpdateOne
+from app.db.mongo import passages_collection
+from app.utils.vector_codec import FORMATS, decode_embedding, encode_embedding
+
+
+def migrate(fmt: str, user_id: str = None, batch_size: int = 1000) -> int:
+    query = {"embedding_format": {"$ne": fmt}}
+    if user_id:
+        query["user_id"] = user_id
+    projection = {"embedding": 1, "embedding_format": 1, "embedding_scale": 1}
+
+    converted = 0
+    updates = []
+    for passage in passages_collection.find(query, projection).batch_size(batch_size):
+        fields = encode_embedding(decode_embedding(passage), fmt)
+        update = {"$set": fields}
+        if "embedding_scale" not in fields:
+            update["$unset"] = {"embedding_scale": ""}
+        updates.append(UpdateOne({"_id": passage["_id"]}, update))
+        if len(updates) == batch_size:
+            passages_collection.bulk_write(updates, ordered=False)
+            converted += len(updates)
+            updates = []
+            print(f"converted {converted} passages")
+    if updates:
+        passages_collection.bulk_write(updates, ordered=False)
+        converted += len(updates)
+    return converted
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--format", choices=FORMATS, default="float32")
+    parser.add_argument("--user", help="only migrate this user's passages")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    converted = migrate(args.format, args.user, args.batch_size)
+    print(f"done: {converted} passages stored as {args.format}")
+
+
+if __name__ == "__main__":
+    main()
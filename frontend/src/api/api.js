@@ -19,6 +19,10 @@ export const uploadFile = (file, title) => {
     });
 };
 
+export const getJobStatus = (jobId) => api.get(`/jobs/${jobId}`, {
+  headers: getAuthHeader()
+});
+
 export const searchQuery = (q, top_k = 8) => api.get(`/search?q=${encodeURIComponent(q)}&top_k=${top_k}`, {
   headers: getAuthHeader()
 });
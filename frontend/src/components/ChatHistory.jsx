@@ -5,23 +5,29 @@ import { API_BASE_URL } from '../config/constants';
 function ChatHistory({ onSelectChat, currentChatId, refreshTrigger = 0 }) {
   const [chats, setChats] = useState([]);
   const [loading, setLoading] = useState(false);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
 
   useEffect(() => {
     loadChatHistory();
   }, [refreshTrigger]);
 
+  const fetchPage = (token, cursor) => axios.get(`${API_BASE_URL}/api/history/list`, {
+    headers: {
+      'Authorization': `Bearer ${token}`
+    },
+    params: cursor ? { cursor } : {}
+  });
+
   const loadChatHistory = async () => {
     const token = localStorage.getItem('token');
     if (!token) return;
 
     setLoading(true);
     try {
-      const response = await axios.get(`${API_BASE_URL}/api/history/list`, {
-        headers: {
-          'Authorization': `Bearer ${token}`
-        }
-      });
+      const response = await fetchPage(token);
       setChats(response.data.chats);
+      setNextCursor(response.data.next_cursor);
     } catch (error) {
       console.error('Failed to load chat history:', error);
     } finally {
@@ -29,6 +35,23 @@ function ChatHistory({ onSelectChat, currentChatId, refreshTrigger = 0 }) {
     }
   };
 
+  // The list is paged (newest first); older chats are fetched on demand
+  const loadMoreChats = async () => {
+    const token = localStorage.getItem('token');
+    if (!token || !nextCursor) return;
+
+    setLoadingMore(true);
+    try {
+      const response = await fetchPage(token, nextCursor);
+      setChats(prev => [...prev, ...response.data.chats]);
+      setNextCursor(response.data.next_cursor);
+    } catch (error) {
+      console.error('Failed to load more chats:', error);
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   const handleDeleteChat = async (chatId, e) => {
     e.stopPropagation();
     const token = localStorage.getItem('token');
@@ -135,6 +158,26 @@ function ChatHistory({ onSelectChat, currentChatId, refreshTrigger = 0 }) {
               </button>
             </div>
           ))}
+          {nextCursor && (
+            <button
+              onClick={loadMoreChats}
+              disabled={loadingMore}
+              style={{
+                display: 'block',
+                width: 'calc(100% - 16px)',
+                margin: '8px',
+                padding: '8px',
+                background: 'none',
+                border: '1px solid #ddd',
+                borderRadius: '4px',
+                color: '#667eea',
+                cursor: loadingMore ? 'default' : 'pointer',
+                fontSize: '13px'
+              }}
+            >
+              {loadingMore ? 'Loading...' : 'Load older chats'}
+            </button>
+          )}
         </div>
       )}
     </div>
@@ -1,7 +1,7 @@
 import React, { useState, useRef, useEffect } from 'react';
 import { Send, Upload as UploadIcon } from 'lucide-react';
 import axios from 'axios';
-import { searchQuery, uploadFile as uploadFileAPI } from '../api/api';
+import { searchQuery, uploadFile as uploadFileAPI, getJobStatus } from '../api/api';
 import SourceSnippet from '../components/SourceSnippet';
 import { API_BASE_URL } from '../config/constants';
 
@@ -74,6 +74,7 @@ const ChatMessage = ({ message, isUser }) => {
 
 function SearchPage({ chatId, isLoggedIn = false, onChatSaved }) {
   const [messages, setMessages] = useState([]);
+  const [activeChatId, setActiveChatId] = useState(chatId);
   const [input, setInput] = useState('');
   const [loading, setLoading] = useState(false);
   const [showUploadModal, setShowUploadModal] = useState(false);
@@ -93,6 +94,7 @@ function SearchPage({ chatId, isLoggedIn = false, onChatSaved }) {
 
   // Load chat messages when chatId changes
   useEffect(() => {
+    setActiveChatId(chatId);
     if (chatId === null) {
       // New chat - clear messages and uploaded files
       setMessages([]);
@@ -109,31 +111,44 @@ function SearchPage({ chatId, isLoggedIn = false, onChatSaved }) {
     if (!token) return;
 
     try {
-      const response = await axios.get(`${API_BASE_URL}/api/history/${id}`, {
-        headers: {
-          'Authorization': `Bearer ${token}`
-        }
-      });
-      setMessages(response.data.messages);
+      // Messages come a page at a time; follow next_offset to the end
+      let loaded = [];
+      let offset = 0;
+      while (offset !== null) {
+        const response = await axios.get(`${API_BASE_URL}/api/history/${id}`, {
+          params: { offset, limit: 200 },
+          headers: {
+            'Authorization': `Bearer ${token}`
+          }
+        });
+        loaded = loaded.concat(response.data.messages);
+        offset = response.data.next_offset;
+      }
+      setMessages(loaded);
     } catch (error) {
       console.error('Failed to load chat:', error);
     }
   };
 
-  const saveToHistory = async (chatMessages) => {
+  const saveToHistory = async (chatMessages, newMessages) => {
     const token = localStorage.getItem('token');
     if (!token) return;
 
     try {
-      const title = chatMessages[0]?.text?.substring(0, 50) || 'New Chat';
-      await axios.post(`${API_BASE_URL}/api/history/save`, {
-        title: title,
-        messages: chatMessages
-      }, {
-        headers: {
-          'Authorization': `Bearer ${token}`
-        }
-      });
+      const headers = { 'Authorization': `Bearer ${token}` };
+      if (activeChatId) {
+        // Existing chat: send only this turn's messages
+        await axios.post(`${API_BASE_URL}/api/history/${activeChatId}/messages`, {
+          messages: newMessages
+        }, { headers });
+      } else {
+        const title = chatMessages[0]?.text?.substring(0, 50) || 'New Chat';
+        const response = await axios.post(`${API_BASE_URL}/api/history/save`, {
+          title: title,
+          messages: chatMessages
+        }, { headers });
+        setActiveChatId(response.data.id);
+      }
       // Trigger history refresh
       if (onChatSaved) {
         onChatSaved();
@@ -164,7 +179,7 @@ function SearchPage({ chatId, isLoggedIn = false, onChatSaved }) {
       setMessages(finalMessages);
       
       // Save to history immediately
-      await saveToHistory(finalMessages);
+      await saveToHistory(finalMessages, [userMessage, botMessage]);
     } catch (error) {
       console.error("Search failed:", error);
       const errorMessage = { text: '❌ Sorry, something went wrong. Please try again.', isUser: false };
@@ -172,7 +187,7 @@ function SearchPage({ chatId, isLoggedIn = false, onChatSaved }) {
       
       // Still save the conversation with error message
       const messagesWithError = [...updatedMessages, errorMessage];
-      await saveToHistory(messagesWithError);
+      await saveToHistory(messagesWithError, [userMessage, errorMessage]);
     }
     setLoading(false);
   };
@@ -186,8 +201,23 @@ function SearchPage({ chatId, isLoggedIn = false, onChatSaved }) {
     setUploading(true);
     setUploadMessage('');
     try {
-      await uploadFileAPI(uploadFile, uploadTitle);
-      
+      const res = await uploadFileAPI(uploadFile, uploadTitle);
+
+      // Ingestion runs in the background; wait for the job to finish
+      let job = res.data;
+      while (job.status === 'queued' || job.status === 'running') {
+        setUploadMessage(job.pages_total
+          ? `⏳ Processing... page ${job.pages_done} of ${job.pages_total}`
+          : '⏳ Processing...');
+        await new Promise(resolve => setTimeout(resolve, 1000));
+        job = (await getJobStatus(res.data.job_id)).data;
+      }
+      if (job.status === 'failed') {
+        setUploadMessage(`❌ Processing failed: ${job.error || 'unknown error'}`);
+        setUploading(false);
+        return;
+      }
+
       // Add to uploaded files list
       setUploadedFiles(prev => [...prev, {
         name: uploadTitle,
@@ -195,7 +225,9 @@ function SearchPage({ chatId, isLoggedIn = false, onChatSaved }) {
         size: uploadFile.size
       }]);
       
-      setUploadMessage('✅ Document uploaded successfully!');
+      setUploadMessage(job.duplicate
+        ? '✅ This document was already uploaded.'
+        : '✅ Document uploaded successfully!');
       setUploadTitle('');
       setUploadFileState(null);
       if (fileInputRef.current) fileInputRef.current.value = '';